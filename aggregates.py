@@ -0,0 +1,91 @@
+import pandas as pd
+from dtypes import release_years
+from windows import WINDOW_COLUMNS, window_columns, window_stats
+
+# Number of albums kept per highlight list (top rated, lowest rated, ...)
+HIGHLIGHT_SIZE = 3
+
+# Columns of the transformed albums frame that compute_aggregates reads
+AGGREGATE_COLUMNS = ['position', 'name', 'artist', 'artistOrigin', 'releaseDate', 'images', 'allGenres', 'streak', 'rating', 'globalRating', 'review', 'youtubeMusicId'] + window_columns()
+
+# Columns of the rating trend, one row per rated album in history order
+TREND_COLUMNS = ['position'] + [col.lower() for col in window_columns()]
+
+HIGHLIGHT_COLUMNS = ['kind', 'rank', 'name', 'artist', 'images', 'releasedate', 'rating', 'rating_diff', 'review', 'youtubemusicid']
+
+
+def get_decade(years):
+    """
+    Maps release years to decade labels such as '1970s', dropping unparseable years.
+    """
+    years = release_years(years).dropna()
+    return (years // 10 * 10).astype(int).astype(str) + 's'
+
+
+def compute_aggregates(df2):
+    """
+    Computes every aggregate shown on the dashboards from the transformed albums frame.
+    Returns a dict of small DataFrames: kpis, genre_counts, decade_counts, origin_counts, album_highlights
+    and rating_trend.
+    """
+    albums = df2.rename(columns=str.lower)
+    if 'position' not in albums.columns:
+        albums = albums.assign(position=range(len(albums)))
+
+    # Snapshots written before the windowed statistics existed, approximated from their rated albums only
+    if not set(TREND_COLUMNS).issubset(albums.columns):
+        stats = window_stats(albums, columns=[col.lower() for col in WINDOW_COLUMNS]).rename(columns=str.lower)
+        albums = albums.drop(columns=stats.columns, errors='ignore').join(stats)
+
+    albums = albums.assign(rating_diff=albums['rating'] - albums['globalrating'])
+
+    kpis = pd.DataFrame({
+        'average_rating': [albums['rating'].mean()],
+        'total_albums': [len(albums)],
+        'best_streak': [albums['streak'].max()],
+        'worst_streak': [albums['streak'].min()]
+    })
+
+    # Most frequent genres first, ties by name, like browse.GENRE_COUNTS_QUERY
+    genres = albums['allgenres'].str.split(', ').explode()
+    genres = genres[genres.notna() & genres.ne('')]
+    genre_counts = genres.value_counts(sort=False).rename_axis('genre').reset_index(name='count')
+    genre_counts = genre_counts.sort_values(['count', 'genre'], ascending=[False, True], ignore_index=True)
+
+    decade_counts = get_decade(albums['releasedate']).value_counts().sort_index()
+    decade_counts = decade_counts.rename_axis('decade').reset_index(name='count')
+
+    # Categorical origins count their unused categories too
+    origin_counts = albums['artistorigin'].value_counts()
+    origin_counts = origin_counts[origin_counts > 0]
+    origin_counts = origin_counts.rename_axis('artistorigin').reset_index(name='count')
+
+    highlights = {
+        'top_rated': albums.nlargest(HIGHLIGHT_SIZE, 'rating'),
+        'lowest_rated': albums.nsmallest(HIGHLIGHT_SIZE, 'rating'),
+        'overrated': albums.nlargest(HIGHLIGHT_SIZE, 'rating_diff'),
+        # Sort descending to show the album with the most negative difference last.
+        'underrated': albums.nsmallest(HIGHLIGHT_SIZE, 'rating_diff').sort_values(by='rating_diff', ascending=False),
+        # Most recent first
+        'latest': albums.tail(HIGHLIGHT_SIZE).iloc[::-1]
+    }
+
+    album_highlights = pd.concat([
+        frame.assign(kind=kind, rank=range(len(frame))) for kind, frame in highlights.items()
+    ], ignore_index=True)[HIGHLIGHT_COLUMNS]
+
+    return {
+        'kpis': kpis,
+        'genre_counts': genre_counts,
+        'decade_counts': decade_counts,
+        'origin_counts': origin_counts,
+        'album_highlights': album_highlights,
+        'rating_trend': albums[TREND_COLUMNS].reset_index(drop=True)
+    }
+
+
+def get_highlights(album_highlights, kind):
+    """
+    Returns one highlight list, in rank order.
+    """
+    return album_highlights[album_highlights['kind'] == kind].sort_values('rank')
@@ -1,10 +1,22 @@
+import io
+import os
+import time
+import sys
+import argparse
 import numpy as np
 import pandas as pd
 import logging
 import requests
-import datetime
 import psycopg2
-from psycopg2.extensions import register_adapter, AsIs
+from psycopg2.extensions import register_adapter, AsIs, cursor as base_cursor
+from extract import fetch_project_cached, mark_loaded, parse_project_stream
+from transform import transform_music
+from aggregates import compute_aggregates
+from browse import SORT_KEYS
+from snapshots import write_snapshot
+from windows import window_columns
+from recommend import INDEX_PATH, RECOMMEND_QUERY, build_index, save_index
+from metrics import METRICS_PATH, finish_run, stage, start_run
 register_adapter(np.int64, AsIs)
 
 hostname = 'localhost'
@@ -16,12 +28,132 @@ port_id = 5432
 conn = None
 cur = None
 
-file = open("log.txt", "a")
-file.write(f"Admin Task executed at {datetime.datetime.now()}\n")
-file.close()
-
+# Project loaded when no project ids are given
 PROJECT_ID = "um-ano-e-meio-de-musica"
 
+# Number of album rows streamed per COPY batch
+BATCH_SIZE = 5000
+
+ALBUM_COLUMNS = ['project_id', 'position', 'artist', 'name', 'artistOrigin', 'releaseDate', 'images', 'allGenres', 'streak', 'rating', 'globalRating', 'review', 'youtubeMusicId'] + window_columns() + ['rowHash']
+
+# Precomputed aggregates read by the dashboard, see aggregates.compute_aggregates;
+# genre counts are grouped from the 'album_genres' table instead
+SUMMARY_TABLES = {
+    'summary_kpis': '''
+    CREATE TABLE IF NOT EXISTS summary_kpis (
+        project_id VARCHAR(255) NOT NULL,
+        average_rating float,
+        total_albums INT,
+        best_streak float,
+        worst_streak float
+    )
+    ''',
+    'summary_decade_counts': '''
+    CREATE TABLE IF NOT EXISTS summary_decade_counts (
+        project_id VARCHAR(255) NOT NULL,
+        decade VARCHAR(255),
+        count INT
+    )
+    ''',
+    'summary_origin_counts': '''
+    CREATE TABLE IF NOT EXISTS summary_origin_counts (
+        project_id VARCHAR(255) NOT NULL,
+        artistOrigin VARCHAR(255),
+        count INT
+    )
+    ''',
+    'summary_album_highlights': '''
+    CREATE TABLE IF NOT EXISTS summary_album_highlights (
+        project_id VARCHAR(255) NOT NULL,
+        kind VARCHAR(255),
+        rank INT,
+        name VARCHAR(255),
+        artist VARCHAR(255),
+        images VARCHAR(255),
+        releaseDate SMALLINT,
+        rating SMALLINT,
+        rating_diff float,
+        review TEXT,
+        youtubeMusicId VARCHAR(255)
+    )
+    '''
+}
+
+# Every table is keyed by project, so one database serves any number of projects; each primary key
+# and index leads with project_id, so a project's reads only touch its own index ranges
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS current_album (
+    project_id VARCHAR(255) PRIMARY KEY,
+    artist VARCHAR(255),
+    artistOrigin VARCHAR(255),
+    images VARCHAR(255),
+    genres VARCHAR(255),
+    subGenres VARCHAR(255),
+    name VARCHAR(255),
+    releaseDate int,
+    youtubeMusicId VARCHAR(255),
+    spotifyId VARCHAR(255),
+    updateFrequency VARCHAR(255)
+);
+CREATE TABLE IF NOT EXISTS albums (
+    project_id VARCHAR(255),
+    position INT,
+    artist VARCHAR(255),
+    name VARCHAR(255),
+    artistOrigin VARCHAR(255),
+    releaseDate SMALLINT,
+    images VARCHAR(255),
+    allGenres TEXT,
+    streak real,
+    rating SMALLINT,
+    globalRating real,
+    review TEXT,
+    youtubeMusicId VARCHAR(255),
+    rowHash BIGINT,
+    PRIMARY KEY (project_id, position)
+);
+CREATE TABLE IF NOT EXISTS genres (
+    genre_id SERIAL PRIMARY KEY,
+    genre TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS album_genres (
+    project_id VARCHAR(255),
+    position INT,
+    genre_id INT REFERENCES genres (genre_id),
+    PRIMARY KEY (project_id, position, genre_id),
+    FOREIGN KEY (project_id, position) REFERENCES albums (project_id, position) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS album_genres_genre_idx ON album_genres (project_id, genre_id, position);
+CREATE TABLE IF NOT EXISTS load_version (
+    project_id VARCHAR(255) PRIMARY KEY,
+    version BIGINT,
+    loadedAt TIMESTAMP
+);
+'''
+
+# Statements adding the windowed rating statistics of each album, see windows.window_stats, by lower-case
+# column name; added in place so existing rows are kept
+WINDOW_SCHEMA = {col.lower(): f'ALTER TABLE albums ADD COLUMN IF NOT EXISTS {col} real' for col in window_columns()}
+
+# Columns typed as text or double precision before the compact schema, see dtypes.NUMERIC_DTYPES, with their
+# compact types and the expression converting the stored values; release dates keep the year of a year or ISO date
+RETYPED_COLUMNS = {
+    'albums': {
+        'releasedate': ('smallint', "substring(releasedate from '^\\s*(\\d{4})')::smallint"),
+        'rating': ('smallint', 'rating::smallint'),
+        'globalrating': ('real', 'globalrating::real'),
+        'streak': ('real', 'streak::real'),
+        **{col.lower(): ('real', f'{col}::real') for col in window_columns()}
+    },
+    'summary_album_highlights': {
+        'releasedate': ('smallint', "substring(releasedate from '^\\s*(\\d{4})')::smallint"),
+        'rating': ('smallint', 'rating::smallint')
+    }
+}
+
+# Tables of the single-project schema, dropped once when migrating to the project-keyed one
+SINGLE_PROJECT_TABLES = ['album_genres', 'current_album', 'albums', 'load_version'] + [table for table in SUMMARY_TABLES] + ['summary_genre_counts']
+
 # Logging configuration
 logging.basicConfig(
     level=logging.INFO,
@@ -29,229 +161,504 @@ logging.basicConfig(
 )
 
 
-def extract_music():
+class CountingCursor(base_cursor):
     """
-    Extracts data from the API and saves it to a JSON file.
+    Cursor counting the statements and COPY commands it sends, each one a round trip to the server.
     """
+    round_trips = 0
 
-    logging.info("Requesting API data...")
+    def execute(self, *args, **kwargs):
+        self.round_trips += 1
+        return super().execute(*args, **kwargs)
 
-    try:
-        response = requests.get("https://1001albumsgenerator.com/api/v1/projects/{}".format(PROJECT_ID))
-        response.raise_for_status()  # Raise an error for bad responses
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to fetch data from URL: {e}")
-        return
-
-    data = response.json()
-
-    # current album
-    current_album = data['currentAlbum']
-
-    artist = current_album['artist']
-    artistOrigin = current_album['artistOrigin']
-    imagesUrl = current_album['images'][0]['url']
-    genres = current_album['genres']
-    subGenres = current_album['subGenres']
-    name = current_album['name']
-    releaseDate = current_album['releaseDate']
-    youtubeMusicId = current_album['youtubeMusicId']
-    spotifyId = current_album['spotifyId']
-
-    current = pd.DataFrame({
-        'artist': artist,
-        'artistOrigin': artistOrigin,
-        'images': imagesUrl,
-        'genres': [genres],
-        'subGenres': [subGenres],
-        'name': name,
-        'releaseDate': releaseDate,
-        'youtubeMusicId': youtubeMusicId,
-        'spotifyId': spotifyId
-    }, index=[0])
-
-    logging.info(f"Extracted data for current album: {name} by {artist}")
-
-    # listening history
-    history = pd.DataFrame(data['history'])
-
-    # past albums
-
-    all_albums = history['album'].tolist()
-    past_albums = pd.DataFrame(all_albums)
-
-    albums_df = pd.DataFrame()
-
-    albums_df['artist'] = past_albums['artist']
-    albums_df['name'] = past_albums['name']
-    albums_df['artistOrigin'] = past_albums['artistOrigin']
-    albums_df['releaseDate'] = past_albums['releaseDate']
-    albums_df['images'] = past_albums['images'].apply(lambda x: x[0]['url'] if isinstance(x, list) and len(x) > 0 else None)
-    albums_df['genres'] = past_albums['genres'].apply(lambda x: x if isinstance(x, list) else [])
-    albums_df['subGenres'] = past_albums['subGenres'].apply(lambda x: x if isinstance(x, list) else [])
-    albums_df['rating'] = history['rating']
-    albums_df['globalRating'] = history['globalRating']
-    albums_df['review'] = history['review']
-    albums_df['youtubeMusicId'] = past_albums['youtubeMusicId']
+    def copy_expert(self, *args, **kwargs):
+        self.round_trips += 1
+        return super().copy_expert(*args, **kwargs)
+
+
+def connection_params(dbname=None):
+    """
+    Returns the psycopg2 connection parameters of the application database, or of another database on the same server.
+    """
+    return dict(host=hostname, dbname=dbname or database, user=username, password=pwd, port=port_id)
+
+
+def extract_music(source=None, project_id=PROJECT_ID):
+    """
+    Extracts data from the API, or from an already downloaded project file, streaming the history.
+    """
+
+    if source is None:
+        logging.info("Requesting API data...")
+
+        try:
+            source, _ = fetch_project_cached(project_id)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to fetch data from URL: {e}")
+            return
+
+    with stage('extract', project_id) as record:
+        current, albums_df = parse_project_stream(source)
+        record['rows_out'] = len(albums_df)
+        if isinstance(source, (str, os.PathLike)):
+            record['bytes_read'] = os.path.getsize(source)
 
     logging.info("Data extracted and saved sucessfully.")
 
     return current, albums_df
 
 
-def transform_music(df1, df2):
+def copy_frame(cur, frame, table, columns, batch_size=BATCH_SIZE):
     """
-    Applies transformations to the data pulled from XComs.
+    Streams the given columns of a frame into a table with COPY, batch_size rows at a time.
+    Returns the number of rows copied.
     """
-    logging.info("Transforming data...")
-    logging.info(f"Applying transformations to {len(df2) + len(df1)} rows...")
-
-    # Convert list columns to comma-separated strings
-    for col in ['genres', 'subGenres']:
-        df1[col] = df1[col].apply(lambda x: ', '.join(x) if isinstance(x, list) else x)
+    copy_script = "COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL '\\N')".format(table, ', '.join(columns))
 
-    for col in ['genres', 'subGenres']:
-        df2[col] = df2[col].apply(lambda x: ', '.join(x) if isinstance(x, list) else x)
+    rows = 0
+    for start in range(0, len(frame), batch_size):
+        batch = frame[columns].iloc[start:start + batch_size]
 
-    # Merge genres and subGenres into a single column
-    df2['allGenres'] = df2.apply(lambda row: ', '.join(filter(None, [row['genres'], row['subGenres']])), axis=1)
+        buffer = io.StringIO()
+        batch.to_csv(buffer, index=False, header=False, na_rep='\\N')
+        buffer.seek(0)
 
-    # Remove genre duplicates
-    df2['allGenres'] = df2['allGenres'].apply(lambda x: ', '.join(sorted(set(map(str.strip, x.split(','))))))
+        cur.copy_expert(copy_script, buffer)
+        rows += len(batch)
 
-    # Drop the original genres and subGenres columns
-    df2 = df2.drop(columns=['genres', 'subGenres'])
+    return rows
 
-    # Create 5 albums global rating streak
-    df2['streak'] = df2['globalRating'].rolling(window=5).mean()
 
-    # Remove Nan Values on Rating
-    df2 = df2.dropna(subset=['rating'])
-    df2['rating'] = df2['rating'].astype(int)
+def copy_albums(cur, df2, batch_size=BATCH_SIZE, table='albums'):
+    """
+    Streams the albums frame into the given table with COPY, batch_size rows at a time.
+    Returns the number of rows copied.
+    """
+    return copy_frame(cur, df2, table, ALBUM_COLUMNS, batch_size)
 
-    logging.info("Data transformed successfully.")
 
-    return df1, df2
+def row_hashes(df2):
+    """
+    Returns a stable 64-bit hash of every album row, used to detect changed rows between loads.
+    """
+    columns = [col for col in ALBUM_COLUMNS if col not in ('project_id', 'rowHash')]
+    return pd.util.hash_pandas_object(df2[columns], index=False).astype('int64')
 
 
-def load_music(df1, df2):
+def insert_current_album(cur, project_id, df1):
     """
-    Loads transformed data into a PostgreSQL database.
+    Replaces the project's row of the 'current_album' table.
     """
-    try:
-        conn = psycopg2.connect(
-            host=hostname,
-            dbname=database,
-            user=username,
-            password=pwd,
-            port=port_id
-        )
+    cur.execute('DELETE FROM current_album WHERE project_id = %s', (project_id,))
 
-        cur = conn.cursor()
-
-        logging.info("Connected to database successfully.")
-
-        # Drop tables if they exist
-        drop_script = '''
-        DROP TABLE IF EXISTS current_album;
-        DROP TABLE IF EXISTS albums;
-        '''
-        cur.execute(drop_script)
-        conn.commit()
-
-        logging.info("Dropped 'current_album' and 'albums' tables if they existed.")
-
-        # Create tables if they don't exist
-        create_script = '''
-        CREATE TABLE IF NOT EXISTS current_album (
-            artist VARCHAR(255),
-            artistOrigin VARCHAR(255),
-            images VARCHAR(255),
-            genres VARCHAR(255),
-            subGenres VARCHAR(255),
-            name VARCHAR(255),
-            releaseDate int,
-            youtubeMusicId VARCHAR(255),
-            spotifyId VARCHAR(255)
-        )
-        '''
-        cur.execute(create_script)
+    insert_script = 'INSERT INTO current_album (project_id, artist, artistOrigin, images, genres, subGenres, name, releasedate, youtubemusicid, spotifyid, updateFrequency) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
 
-        conn.commit()
+    insert_value = (
+        project_id,
+        df1['artist'].iloc[0],
+        df1['artistOrigin'].iloc[0],
+        df1['images'].iloc[0],
+        df1['genres'].iloc[0],
+        df1['subGenres'].iloc[0],
+        df1['name'].iloc[0],
+        df1['releaseDate'].iloc[0],
+        df1['youtubeMusicId'].iloc[0],
+        df1['spotifyId'].iloc[0],
+        df1['updateFrequency'].iloc[0]
+    )
 
-        logging.info("Created 'current_album' table if it didn't exist.")
+    cur.execute(insert_script, insert_value)
 
-        insert_script = 'INSERT INTO current_album (artist, artistOrigin, images, genres, subGenres, name, releasedate, youtubemusicid, spotifyid) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)'
+    logging.info("Inserted data into 'current_album' table.")
 
-        insert_value = (
-            df1['artist'].iloc[0],
-            df1['artistOrigin'].iloc[0],
-            df1['images'].iloc[0],
-            df1['genres'].iloc[0],
-            df1['subGenres'].iloc[0],
-            df1['name'].iloc[0],
-            df1['releaseDate'].iloc[0],
-            df1['youtubeMusicId'].iloc[0],
-            df1['spotifyId'].iloc[0]
-        )
 
-        cur.execute(insert_script, insert_value)
-        conn.commit()
-
-        logging.info("Inserted data into 'current_album' table.")
-
-        create_script = '''
-        CREATE TABLE IF NOT EXISTS albums (
-            artist VARCHAR(255),
-            name VARCHAR(255),
-            artistOrigin VARCHAR(255),
-            releaseDate VARCHAR(255),
-            images VARCHAR(255),
-            allGenres VARCHAR(255),
-            streak float,
-            rating INT,
-            globalRating float,
-            review TEXT,
-            youtubeMusicId VARCHAR(255)
+def create_schema(cur):
+    """
+    Creates the project-keyed tables and indexes if missing, first dropping the tables of the
+    single-project schema if they are still around.
+    """
+    cur.execute('''
+        SELECT 1 FROM information_schema.tables t
+        WHERE t.table_name = 'albums' AND NOT EXISTS (
+            SELECT 1 FROM information_schema.columns c
+            WHERE c.table_name = 'albums' AND c.column_name = 'project_id'
         )
-        '''
+    ''')
+    if cur.fetchone() is not None:
+        cur.execute(''.join(f'DROP TABLE IF EXISTS {table} CASCADE;' for table in SINGLE_PROJECT_TABLES))
+        logging.warning("Dropped the single-project tables; every project is loaded in full once more.")
+
+    cur.execute(SCHEMA)
+
+    # Only altered when a column is missing: ALTER TABLE locks out every reader of albums until the load commits
+    cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'albums'")
+    existing = {row[0] for row in cur.fetchall()}
+    missing = [script for col, script in WINDOW_SCHEMA.items() if col not in existing]
+    if missing:
+        cur.execute('SELECT 1 FROM albums LIMIT 1')
+        backfill = cur.fetchone() is not None
+        cur.execute(';'.join(missing))
+        if backfill:
+            logging.warning("Added the windowed statistics columns; they stay empty for a project until its payload changes or it is loaded with --full.")
+
+    for create_script in SUMMARY_TABLES.values():
         cur.execute(create_script)
-        conn.commit()
-
-        logging.info("Created 'albums' table if it didn't exist.")
-
-        insert_script = 'INSERT INTO albums (artist, name, artistOrigin, releaseDate, images, allGenres, streak, rating, globalRating, review, youtubeMusicId) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
-
-        for _, row in df2.iterrows():
-            insert_value = (
-                row['artist'],
-                row['name'],
-                row['artistOrigin'],
-                row['releaseDate'],
-                row['images'],
-                row['allGenres'],
-                row['streak'],
-                row['rating'],
-                row['globalRating'],
-                row['review'],
-                row['youtubeMusicId']
-            )
-            cur.execute(insert_script, insert_value)
+
+    retype_columns(cur)
+    create_indexes(cur)
+
+
+def retype_columns(cur):
+    """
+    Converts the columns of RETYPED_COLUMNS still holding their old types in place, one table rewrite per table.
+    The sort key indexes over converted albums columns are dropped first; create_indexes builds them again.
+    """
+    for table, columns in RETYPED_COLUMNS.items():
+        cur.execute('SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s', (table,))
+        current = dict(cur.fetchall())
+
+        changed = {col: target for col, target in columns.items() if col in current and current[col] != target[0]}
+        if not changed:
+            continue
+
+        if table == 'albums':
+            cur.execute(''.join(f'DROP INDEX IF EXISTS albums_{col}_idx;' for col in changed if col in SORT_KEYS))
+
+        cur.execute(f'ALTER TABLE {table} ' + ', '.join(f'ALTER COLUMN {col} TYPE {data_type} USING {using}' for col, (data_type, using) in changed.items()))
+        logging.warning(f"Converted {', '.join(changed)} of table '{table}' to their compact types.")
+        if table == 'albums':
+            logging.warning("Album row hashes change with the compact types, so every album is written once more on its project's next load.")
+
+
+def create_indexes(cur):
+    """
+    Creates the per-project indexes behind the history browser's filters and keyset pagination,
+    and the project lookups of the summary tables, if missing.
+    """
+    for col, key in SORT_KEYS.items():
+        if col != 'position':  # Served by the primary key
+            cur.execute(f'CREATE INDEX IF NOT EXISTS albums_{col}_idx ON albums (project_id, ({key}), position)')
+
+    for table in SUMMARY_TABLES:
+        cur.execute(f'CREATE INDEX IF NOT EXISTS {table}_project_idx ON {table} (project_id)')
+
+
+def project_loaded(cur, project_id):
+    """
+    Checks whether the project already has albums in the database.
+    """
+    cur.execute('SELECT 1 FROM albums WHERE project_id = %s LIMIT 1', (project_id,))
+    return cur.fetchone() is not None
+
+
+def loaded_projects(project_ids, dbname=None):
+    """
+    Returns the ones of project_ids with a row in 'load_version'. A payload recorded as loaded by mark_loaded is
+    only skipped when the database still holds its project, which it no longer does after a schema migration
+    dropped the tables. An unreachable database or a missing table counts as no project loaded.
+    """
+    conn = None
+
+    try:
+        conn = psycopg2.connect(**connection_params(dbname))
+        with conn.cursor() as cur:
+            cur.execute('SELECT project_id FROM load_version WHERE project_id = ANY(%s)', (list(project_ids),))
+            return {row[0] for row in cur.fetchall()}
+    except psycopg2.Error as e:
+        logging.warning(f"Could not read the loaded projects, loading them all: {e}")
+        return set()
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def full_load(cur, project_id, df1, df2, batch_size=BATCH_SIZE):
+    """
+    Replaces every album of the project.
+    Returns the number of album rows written.
+    """
+    insert_current_album(cur, project_id, df1)
+
+    # Cascades to the project's 'album_genres' rows
+    cur.execute('DELETE FROM albums WHERE project_id = %s', (project_id,))
+    if cur.rowcount:
+        logging.info(f"Deleted the {cur.rowcount} albums previously loaded for project {project_id}.")
+
+    rows = copy_albums(cur, df2, batch_size)
+    load_genres(cur, project_id, 'albums')
+
+    return rows
+
+
+def incremental_load(cur, project_id, df1, df2, batch_size=BATCH_SIZE):
+    """
+    Upserts only the project's albums that are new since the last load or whose content changed.
+    Returns the number of album rows written.
+    """
+    insert_current_album(cur, project_id, df1)
+
+    # Watermark of the last loaded history position and the hashes already stored
+    cur.execute('SELECT COALESCE(MAX(position), -1) FROM albums WHERE project_id = %s', (project_id,))
+    watermark = cur.fetchone()[0]
+
+    cur.execute('SELECT position, rowHash FROM albums WHERE project_id = %s', (project_id,))
+    loaded = dict(cur.fetchall())
+
+    logging.info(f"Last loaded history position is {watermark}, {len(loaded)} albums already loaded.")
+
+    # New albums past the watermark, plus older albums whose rating, review or streak changed
+    stored_hashes = df2['position'].map(loaded)
+    delta = df2[(df2['position'] > watermark) | (stored_hashes != df2['rowHash'])]
+
+    # Albums that disappeared upstream (e.g. a rating was removed)
+    cur.execute('DELETE FROM albums WHERE project_id = %s AND NOT (position = ANY(%s))', (project_id, df2['position'].tolist()))
+    if cur.rowcount:
+        logging.info(f"Deleted {cur.rowcount} albums no longer present in the history.")
+
+    if delta.empty:
+        return 0
+
+    cur.execute('CREATE TEMP TABLE albums_stage (LIKE albums) ON COMMIT DROP')
+    copy_albums(cur, delta, batch_size, table='albums_stage')
+
+    columns = ', '.join(ALBUM_COLUMNS)
+    updates = ', '.join(f'{col} = EXCLUDED.{col}' for col in ALBUM_COLUMNS if col not in ('project_id', 'position'))
+    cur.execute(f'''
+        INSERT INTO albums ({columns})
+        SELECT {columns} FROM albums_stage
+        ON CONFLICT (project_id, position) DO UPDATE SET {updates}
+    ''')
+
+    load_genres(cur, project_id, 'albums_stage')
+
+    return len(delta)
+
+
+def load_genres(cur, project_id, source):
+    """
+    Splits the genres of the project's albums in the source table ('albums' or the incremental stage)
+    into the shared 'genres' dimension and the 'album_genres' bridge table, replacing the rows of those albums.
+    """
+    cur.execute(f'''
+        CREATE TEMP TABLE source_genres ON COMMIT DROP AS
+        SELECT DISTINCT s.position, t.genre
+        FROM {source} s CROSS JOIN LATERAL unnest(string_to_array(s.allGenres, ', ')) AS t(genre)
+        WHERE s.project_id = %s AND t.genre <> ''
+    ''', (project_id,))
+
+    # In name order, so concurrent loads adding the same new genres wait on each other instead of deadlocking
+    cur.execute('''
+        INSERT INTO genres (genre)
+        SELECT DISTINCT genre FROM source_genres ORDER BY genre
+        ON CONFLICT (genre) DO NOTHING
+    ''')
+
+    cur.execute(f'DELETE FROM album_genres WHERE project_id = %s AND position IN (SELECT position FROM {source} WHERE project_id = %s)', (project_id, project_id))
+    cur.execute('''
+        INSERT INTO album_genres (project_id, position, genre_id)
+        SELECT %s, s.position, g.genre_id FROM source_genres s JOIN genres g USING (genre)
+    ''', (project_id,))
+
+    logging.info(f"Loaded {cur.rowcount} album genres.")
+
+
+def load_aggregates(cur, project_id, aggregates):
+    """
+    Replaces the project's rows of the dashboard summary tables with freshly computed aggregates.
+    """
+    for name, frame in aggregates.items():
+        table = f'summary_{name}'
+
+        cur.execute(f'DELETE FROM {table} WHERE project_id = %s', (project_id,))
+        copy_frame(cur, frame.assign(project_id=project_id), table, ['project_id'] + list(frame.columns))
+
+    logging.info(f"Loaded {len(aggregates)} summary tables.")
+
+
+def bump_load_version(cur, project_id):
+    """
+    Increments the project's 'load_version' row so dashboards know their cached reads are stale.
+    """
+    cur.execute('''
+        INSERT INTO load_version (project_id, version, loadedAt) VALUES (%s, 1, NOW())
+        ON CONFLICT (project_id) DO UPDATE SET version = load_version.version + 1, loadedAt = NOW()
+        RETURNING version
+    ''', (project_id,))
+    version = cur.fetchone()[0]
+
+    logging.info(f"Bumped load version of project {project_id} to {version}.")
+
+    return version
+
+
+def load_music(df1, df2, batch_size=BATCH_SIZE, incremental=True, snapshot_dir=None, project_id=PROJECT_ID, conn=None, schema=True):
+    """
+    Loads a project's transformed data into a PostgreSQL database.
+    Incremental loads upsert the delta, otherwise the project's albums are replaced; either way in a single transaction.
+    With snapshot_dir, the committed load is also written there as a Parquet snapshot, under the project id.
+    conn is an open connection to load through, left open afterwards; by default one is opened and closed.
+    Without schema the tables are assumed to be created already, see create_schema.
+    Returns True when the load was committed.
+    """
+    owned = conn is None
+    cur = None
+
+    df2 = df2.assign(project_id=project_id, rowHash=row_hashes(df2))
+
+    with stage('load', project_id, rows_in=len(df2)) as record:
+        try:
+            if owned:
+                conn = psycopg2.connect(**connection_params())
+                logging.info("Connected to database successfully.")
+
+            cur = conn.cursor(cursor_factory=CountingCursor)
+
+            start = time.perf_counter()
+
+            if schema:
+                create_schema(cur)
+
+            if incremental and project_loaded(cur, project_id):
+                logging.info(f"Running incremental load of project {project_id}...")
+                rows = incremental_load(cur, project_id, df1, df2, batch_size)
+            else:
+                logging.info(f"Running full load of project {project_id}...")
+                rows = full_load(cur, project_id, df1, df2, batch_size)
+
+            aggregates = compute_aggregates(df2)
+            del aggregates['genre_counts']  # Grouped from 'album_genres' by the dashboard
+            del aggregates['rating_trend']  # Read from the windowed statistics columns of 'albums'
+            load_aggregates(cur, project_id, aggregates)
+            version = bump_load_version(cur, project_id)
             conn.commit()
+            elapsed = time.perf_counter() - start
+            record['rows_out'] = rows
+
+            logging.info(f"Wrote {rows} rows into 'albums' table in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec, batch size {batch_size}).")
+
+            # The load is committed whatever happens to the snapshot, so its failure does not fail the load
+            if snapshot_dir is not None:
+                try:
+                    write_snapshot(os.path.join(snapshot_dir, project_id), version, df1, df2.drop(columns='project_id'))
+                except Exception as e:
+                    logging.warning(f"Loaded project {project_id} but failed to write its snapshot: {e}")
+                    record['snapshot_error'] = f'{type(e).__name__}: {e}'
+
+            return True
+
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            logging.error(f"Failed to load data to database: {e}")
+            record.update(status='error', error=f'{type(e).__name__}: {e}')
+            return False
+        finally:
+            if cur is not None:
+                record['round_trips'] = cur.round_trips
+                cur.close()
+            if owned and conn is not None:
+                conn.close()
+
+
+def positive_int(value):
+    """
+    Parses a command line value as an integer of at least 1.
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
+
+
+def run_project(project_id, full=False, snapshot_dir=None, batch_size=BATCH_SIZE):
+    """
+    Fetches, transforms and loads one project, skipping it when its payload is the one last loaded
+    and the database still holds it.
+    Returns True unless the fetch, the parse, the transform or the load failed.
+    """
+    logging.info(f"Requesting API data for project {project_id}...")
+
+    try:
+        path, changed = fetch_project_cached(project_id)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Failed to fetch data from URL: {e}")
+        return False
+
+    # Nothing new upstream, the database already holds this payload
+    if not changed and not full:
+        if project_id in loaded_projects([project_id]):
+            logging.info(f"Skipping transform and load of project {project_id}.")
+            return True
+        logging.info(f"Project {project_id} is missing from the database, loading it again.")
+
+    try:
+        df1, df2 = extract_music(path, project_id)
+        with stage('transform', project_id, rows_in=len(df2)) as record:
+            transformed_df1, transformed_df2 = transform_music(df1, df2)
+            record['rows_out'] = len(transformed_df2)
+    except Exception as e:
+        logging.error(f"Failed to transform project {project_id}: {type(e).__name__}: {e}")
+        return False
+
+    if not load_music(transformed_df1, transformed_df2, batch_size=batch_size, incremental=not full, snapshot_dir=snapshot_dir, project_id=project_id):
+        return False
+
+    mark_loaded(project_id)
+    return True
+
+
+def build_recommendations(index_path=INDEX_PATH):
+    """
+    Rebuilds the recommendation index from the ratings of every loaded project and writes it to index_path.
+    Returns True when the index was written.
+    """
+    conn = None
+
+    try:
+        conn = psycopg2.connect(**connection_params())
+
+        with conn.cursor() as cur:
+            cur.execute(RECOMMEND_QUERY)
+            albums = pd.DataFrame(cur.fetchall(), columns=[col.name for col in cur.description])
+
+        if albums.empty:
+            logging.warning("No ratings loaded, skipping the recommendation index.")
+            return True
+
+        start = time.perf_counter()
+        save_index(build_index(albums), index_path)
+        logging.info(f"Built recommendation index from {len(albums)} ratings in {time.perf_counter() - start:.2f}s.")
 
-        logging.info("Inserted data into 'albums' table.")
+        return True
 
     except Exception as e:
-        logging.error(f"Failed to load data to database: {e}")
+        logging.error(f"Failed to build recommendation index: {e}")
+        return False
     finally:
-        if cur is not None:
-            cur.close()
         if conn is not None:
             conn.close()
 
 
 if __name__ == "__main__":
 
-    df1, df2 = extract_music()
-    transformed_df1, transformed_df2 = transform_music(df1, df2)
-    load_music(transformed_df1, transformed_df2)
+    parser = argparse.ArgumentParser(description="Load 1001 Albums project histories into PostgreSQL.")
+    parser.add_argument('projects', nargs='*', default=[PROJECT_ID], help=f"project ids to load (default: {PROJECT_ID})")
+    parser.add_argument('--full', action='store_true', help="replace each project's albums instead of upserting the delta")
+    parser.add_argument('--snapshot-dir', help="also write each load as a Parquet snapshot in this directory")
+    parser.add_argument('--batch-size', type=positive_int, default=BATCH_SIZE, help=f"rows per COPY batch (default: {BATCH_SIZE})")
+    parser.add_argument('--recommend-index', nargs='?', const=str(INDEX_PATH), help=f"then rebuild the recommendation index from every project's ratings (default path: {INDEX_PATH})")
+    parser.add_argument('--metrics', default=str(METRICS_PATH), help=f"JSON lines file the per-stage records are appended to (default: {METRICS_PATH})")
+    parser.add_argument('--prometheus', help="also write the run's totals to this file in the Prometheus text format")
+    args = parser.parse_args()
+
+    logging.info(f"Starting run {start_run(jsonl_path=args.metrics, prometheus_path=args.prometheus)}.")
+
+    failed = [project_id for project_id in args.projects if not run_project(project_id, args.full, args.snapshot_dir, args.batch_size)]
+    if failed:
+        logging.error(f"Failed to load {len(failed)} of {len(args.projects)} projects: {', '.join(failed)}")
+
+    recommended = not args.recommend_index or build_recommendations(args.recommend_index)
+    finish_run('ok' if recommended and not failed else 'error')
+
+    if failed or not recommended:
+        sys.exit(1)
@@ -0,0 +1,317 @@
+# Batch backfill of many projects: fetch, transform and load overlap on their own pools
+import os
+import sys
+import time
+import logging
+import argparse
+import multiprocessing
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from album import BATCH_SIZE, connection_params, create_schema, extract_music, load_music, loaded_projects, positive_int
+from extract import PER_HOST_LIMIT, fetch_projects, mark_loaded
+from transform import transform_music
+import metrics
+
+# Threads of the batch extractor; fetch_project_cached lets at most PER_HOST_LIMIT requests reach one host at a time
+FETCH_WORKERS = PER_HOST_LIMIT
+
+# Processes parsing and transforming projects
+TRANSFORM_WORKERS = os.cpu_count() or 1
+
+# Database connections shared by the concurrent loads
+LOAD_CONNECTIONS = 4
+
+# Projects between fetch and load per transform process, bounding the frames held in memory at once
+IN_FLIGHT_PER_WORKER = 2
+
+# Stand-in database of --dry-run, created on the application's server if missing
+DRY_RUN_DATABASE = 'music-app-dry-run'
+
+# Failed project ids, one per line with the failed stage and error as a comment, so the file can be fed back in
+FAILURE_MANIFEST = 'backfill-failures.txt'
+
+# Pipeline stages timed for every project
+STAGES = ['fetch', 'transform', 'load']
+
+logger = logging.getLogger('backfill')
+
+
+def read_project_ids(lines):
+    """
+    Returns the project ids of the given lines in order, once each; blank lines and '#' comments are skipped.
+    """
+    project_ids = (line.split('#', 1)[0].strip() for line in lines)
+    return list(dict.fromkeys(project_id for project_id in project_ids if project_id))
+
+
+def write_manifest(failures, path=FAILURE_MANIFEST):
+    """
+    Writes the failed project ids with their stage and error, readable again by read_project_ids.
+    """
+    with open(path, 'w') as file:
+        for project_id, (stage, error) in failures.items():
+            error = ' '.join(str(error).split())
+            file.write(f'{project_id}  # {stage}: {error}\n')
+
+
+def ensure_database(dbname):
+    """
+    Creates the database on the application's server if it does not exist yet.
+    """
+    conn = psycopg2.connect(**connection_params('postgres'))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1 FROM pg_database WHERE datname = %s', (dbname,))
+            if cur.fetchone() is None:
+                cur.execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(dbname)))
+                logger.info(f"Created database {dbname}.")
+    finally:
+        conn.close()
+
+
+def prepare_schema(dbname=None):
+    """
+    Creates or migrates the tables once, before the loads start: the schema statements lock whole tables,
+    so concurrent loads running them would block or deadlock each other.
+    """
+    conn = psycopg2.connect(**connection_params(dbname))
+    try:
+        with conn.cursor() as cur:
+            create_schema(cur)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class WorkerError(Exception):
+    """
+    A failure in a worker process, carrying the stage records the worker emitted up to it, error records
+    included, so the parent still emits them into the run's metrics.
+    """
+
+    def __init__(self, error, records):
+        super().__init__(error, records)
+        self.error = error
+        self.records = records
+
+    def __str__(self):
+        return self.error
+
+
+def transform_stage(project_id, path):
+    """
+    Parses and transforms a fetched payload; runs in a worker process. Returns (df1, df2, records, seconds),
+    records being the worker's stage records for the parent to emit; raises WorkerError on failure.
+    """
+    start = time.perf_counter()
+    with metrics.capture() as records:
+        try:
+            df1, df2 = extract_music(path, project_id)
+            with metrics.stage('transform', project_id, rows_in=len(df2)) as record:
+                df1, df2 = transform_music(df1, df2)
+                record['rows_out'] = len(df2)
+        except Exception as e:
+            raise WorkerError(f'{type(e).__name__}: {e}', records) from None
+    return df1, df2, records, time.perf_counter() - start
+
+
+def load_stage(pool, project_id, df1, df2, incremental, snapshot_dir, batch_size=BATCH_SIZE):
+    """
+    Loads a transformed project through a pooled connection. Returns (loaded, seconds).
+    """
+    conn = pool.getconn()
+    start = time.perf_counter()
+    try:
+        loaded = load_music(df1, df2, batch_size=batch_size, incremental=incremental, snapshot_dir=snapshot_dir, project_id=project_id, conn=conn, schema=False)
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+    return loaded, time.perf_counter() - start
+
+
+def init_worker(level, parent_run_id):
+    """
+    Applies the parent's log level and run id in a transform process.
+    """
+    logging.getLogger().setLevel(level)
+    metrics.start_run(parent_run_id)
+
+
+def backfill(project_ids, full=False, snapshot_dir=None, dbname=None, skip_unchanged=True, mark=True,
+             fetch_workers=FETCH_WORKERS, transform_workers=TRANSFORM_WORKERS, load_connections=LOAD_CONNECTIONS, batch_size=BATCH_SIZE):
+    """
+    Runs fetch, transform and load for every project. Each stage has its own pool, so one project's load overlaps
+    the next ones' transforms and fetches, and at most IN_FLIGHT_PER_WORKER projects per transform process
+    are between fetch and load at any time.
+    Unchanged payloads of projects the database holds are skipped like album.run_project does unless full
+    or not skip_unchanged; with mark, loaded payloads are recorded so the next run skips them.
+    Returns (timings, failures): the seconds spent in each of the STAGES per project, and project id -> (stage, error).
+    """
+    prepare_schema(dbname)
+    loaded = loaded_projects(project_ids, dbname) if skip_unchanged and not full else set()
+
+    pool = ThreadedConnectionPool(1, load_connections, **connection_params(dbname))
+    context = multiprocessing.get_context('spawn')  # Forking while the fetch threads run could copy held locks
+
+    timings = {}
+    failures = {}
+    skipped = 0
+    pending = {}
+    queue = iter(project_ids)
+    max_in_flight = transform_workers * IN_FLIGHT_PER_WORKER
+    start = time.perf_counter()
+
+    def finished(project_id, stage_timings, outcome):
+        done = len(timings) + len(failures) + skipped
+        rate = done / (time.perf_counter() - start)
+        stages = ', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in stage_timings.items())
+        logger.info(f"[{done}/{len(project_ids)}] {project_id} {outcome} ({stages or 'no stage ran'}); "
+                    f"{rate:.1f} projects/s, {(len(project_ids) - done) / rate:.0f}s left")
+
+    try:
+        with ThreadPoolExecutor(fetch_workers) as fetchers, \
+                ProcessPoolExecutor(transform_workers, mp_context=context, initializer=init_worker, initargs=(logging.getLogger().level, metrics.run_id())) as transformers, \
+                ThreadPoolExecutor(load_connections) as loaders:
+
+            def fill():
+                while len(pending) < max_in_flight:
+                    project_id = next(queue, None)
+                    if project_id is None:
+                        return
+                    for future in fetch_projects(fetchers, [project_id]):
+                        pending[future] = ('fetch', project_id, {})
+
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage, project_id, stage_timings = pending.pop(future)
+
+                    try:
+                        result = future.result()
+                    except WorkerError as e:
+                        for record in e.records:
+                            metrics.emit(record)
+                        failures[project_id] = (stage, e.error)
+                        finished(project_id, stage_timings, f'failed to {stage}: {e}')
+                        continue
+                    except Exception as e:
+                        failures[project_id] = (stage, f'{type(e).__name__}: {e}')
+                        finished(project_id, stage_timings, f'failed to {stage}: {e}')
+                        continue
+
+                    *result, stage_timings[stage] = result
+
+                    if stage == 'fetch':
+                        path, changed = result
+                        if not changed and project_id in loaded:
+                            skipped += 1
+                            finished(project_id, stage_timings, 'unchanged, skipped')
+                        else:
+                            pending[transformers.submit(transform_stage, project_id, path)] = ('transform', project_id, stage_timings)
+
+                    elif stage == 'transform':
+                        df1, df2, records = result
+                        for record in records:
+                            metrics.emit(record)
+                        pending[loaders.submit(load_stage, pool, project_id, df1, df2, not full, snapshot_dir, batch_size)] = ('load', project_id, stage_timings)
+
+                    else:
+                        loaded, = result
+                        if not loaded:
+                            failures[project_id] = (stage, 'load rolled back, see the log')
+                            finished(project_id, stage_timings, 'failed to load')
+                            continue
+                        if mark:
+                            mark_loaded(project_id)
+                        timings[project_id] = stage_timings
+                        finished(project_id, stage_timings, 'loaded')
+
+                fill()
+    finally:
+        pool.closeall()
+
+    return pd.DataFrame.from_dict(timings, orient='index', columns=STAGES), failures
+
+
+def log_summary(timings, failures, elapsed, total):
+    """
+    Logs the run's throughput and, per stage, the total, mean, 95th percentile and slowest time.
+    """
+    logger.info(f"Loaded {len(timings)}, failed {len(failures)} and skipped {total - len(timings) - len(failures)} of {total} projects "
+                f"in {elapsed:.1f}s ({len(timings) / max(elapsed, 1e-9):.1f} projects/s).")
+
+    for stage in STAGES:
+        seconds = timings[stage]
+        if seconds.empty:
+            continue
+        logger.info(f"  {stage:<9} total {seconds.sum():8.1f}s  mean {seconds.mean():6.2f}s  p95 {seconds.quantile(0.95):6.2f}s  max {seconds.max():6.2f}s")
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Backfill many 1001 Albums projects into PostgreSQL, one id per line.")
+    parser.add_argument('sources', nargs='*', default=['-'], help="files listing project ids, '-' for stdin (default)")
+    parser.add_argument('--full', action='store_true', help="replace each project's albums instead of upserting the delta")
+    parser.add_argument('--snapshot-dir', help="also write each load as a Parquet snapshot in this directory")
+    parser.add_argument('--fetch-workers', type=int, default=FETCH_WORKERS, help="concurrent API requests")
+    parser.add_argument('--workers', type=int, default=TRANSFORM_WORKERS, help="transform processes")
+    parser.add_argument('--batch-size', type=positive_int, default=BATCH_SIZE, help=f"rows per COPY batch (default: {BATCH_SIZE})")
+    parser.add_argument('--connections', type=int, default=LOAD_CONNECTIONS, help="database connections of the loads")
+    parser.add_argument('--failures', default=FAILURE_MANIFEST, help="where to write the failed project ids, to retry them with this file as the source")
+    parser.add_argument('--dry-run', nargs='?', const=DRY_RUN_DATABASE, metavar='DATABASE',
+                        help=f"load into a stand-in database on the same server (default: {DRY_RUN_DATABASE}), created if missing; "
+                             "unchanged payloads are loaded too and nothing is recorded as loaded")
+    parser.add_argument('--metrics', default=str(metrics.METRICS_PATH), help=f"JSON lines file the per-stage records are appended to (default: {metrics.METRICS_PATH})")
+    parser.add_argument('--prometheus', help="also write the run's totals to this file in the Prometheus text format")
+    parser.add_argument('--verbose', action='store_true', help="keep the per-step logs of every project")
+    args = parser.parse_args()
+
+    # The pipeline logs a dozen lines per project; the progress lines are enough for thousands of them
+    logger.setLevel(logging.INFO)
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    lines = []
+    for source in args.sources:
+        if source == '-':
+            lines += sys.stdin.readlines()
+        else:
+            with open(source) as file:
+                lines += file.readlines()
+    project_ids = read_project_ids(lines)
+
+    logger.info(f"Starting run {metrics.start_run(jsonl_path=args.metrics, prometheus_path=args.prometheus)}.")
+
+    start = time.perf_counter()
+    try:
+        if args.dry_run:
+            ensure_database(args.dry_run)
+            logger.info(f"Dry run into database {args.dry_run}.")
+        timings, failures = backfill(
+            project_ids,
+            full=args.full,
+            snapshot_dir=None if args.dry_run else args.snapshot_dir,
+            dbname=args.dry_run,
+            skip_unchanged=not args.dry_run,
+            mark=not args.dry_run,
+            fetch_workers=args.fetch_workers,
+            transform_workers=args.workers,
+            load_connections=args.connections,
+            batch_size=args.batch_size
+        )
+    except psycopg2.Error as e:
+        logger.error(f"Failed to prepare the database: {e}")
+        metrics.finish_run('error')
+        sys.exit(1)
+    log_summary(timings, failures, time.perf_counter() - start, len(project_ids))
+    metrics.finish_run('error' if failures else 'ok')
+
+    if failures:
+        write_manifest(failures, args.failures)
+        logger.error(f"Wrote the {len(failures)} failed projects to {args.failures}.")
+        sys.exit(1)
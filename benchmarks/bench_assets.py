@@ -0,0 +1,77 @@
+# Figure payload sent to the browser with full-resolution and with downsized chart images
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import plotly.graph_objects as go
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from images import DECADE_SIZE, FLAG_SIZE, image_data_uri, figure_payload_bytes
+
+DECADES = ['1960s', '1970s', '1980s', '1990s', '2000s', '2010s', '2020s']
+FLAGS = ['us_flag.png', 'uk_flag.jpg', 'other_flag.jpg']
+
+
+def decade_figure(source):
+    """
+    The decade chart of the dashboards: a transparent bar per decade with its image stretched behind it.
+    """
+    counts = range(10, 10 * (len(DECADES) + 1), 10)
+    fig = go.Figure(go.Bar(x=DECADES, y=list(counts), marker_color='rgba(0,0,0,0)'))
+    for decade, count in zip(DECADES, counts):
+        fig.add_layout_image(
+            source=source(ROOT / 'assets' / f'{decade}.jpg', DECADE_SIZE),
+            xref="x", yref="y", x=decade, y=count / 2, sizex=0.8, sizey=count,
+            xanchor="center", yanchor="middle", sizing="stretch", layer="below"
+        )
+    return fig
+
+
+def origin_figure(source):
+    """
+    The origin pie of the dashboards, with a flag over each slice.
+    """
+    fig = go.Figure(go.Pie(labels=['USA', 'UK', 'Other'], values=[50, 30, 20], sort=False))
+    for i, flag in enumerate(FLAGS):
+        fig.add_layout_image(
+            source=source(ROOT / 'assets' / flag, FLAG_SIZE),
+            xref="paper", yref="paper", x=0.3 + 0.2 * i, y=0.5, sizex=0.2, sizey=0.2,
+            xanchor="center", yanchor="middle", sizing="contain", layer="above"
+        )
+    return fig
+
+
+def full_resolution(path, size):
+    """
+    The original path: the decoded image as is, re-encoded by Plotly at full resolution.
+    """
+    return Image.open(path)
+
+
+def timed(build, source):
+    start = time.perf_counter()
+    fig = build(source)
+    payload = figure_payload_bytes(fig)
+    return payload, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Report the figure payload bytes of the image charts before and after downsizing.")
+    parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        def downsized(path, size):
+            return image_data_uri(path, size, cache_dir=tmp)
+
+        for name, build in [('decades', decade_figure), ('origins', origin_figure)]:
+            old_bytes, old_time = timed(build, full_resolution)
+            cold_bytes, cold_time = timed(build, downsized)
+            warm_bytes, warm_time = timed(build, downsized)
+
+            print(f"{name:<8} full resolution {old_bytes / 1024:9.1f} KiB {old_time:6.3f}s  downsized {cold_bytes / 1024:7.1f} KiB, first build {cold_time:6.3f}s, cached {warm_time:6.3f}s  ({old_bytes / cold_bytes:.0f}x smaller)")
@@ -0,0 +1,49 @@
+# Benchmark of the cross-project comparison on synthetic projects rating the 1001 albums
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from compare import MIN_COMMON_ALBUMS, compute_comparison
+from synthetic import make_ratings
+
+
+def pandas_correlations(albums):
+    """
+    The reference pairwise correlations: pivot the ratings and let pandas correlate every pair of columns.
+    """
+    pivot = albums.pivot_table(index=['artist', 'name'], columns='project_id', values='rating', sort=True)
+    return pivot.corr(min_periods=MIN_COMMON_ALBUMS)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time compute_comparison on synthetic projects.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 5_000], help="numbers of projects")
+    parser.add_argument('--reference', type=int, default=300, help="largest size also correlated with pandas for reference")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        albums = make_ratings(n)
+
+        start = time.perf_counter()
+        comparison = compute_comparison(albums)
+        elapsed = time.perf_counter() - start
+
+        line = f"{n:>6,} projects  {len(albums):>10,} ratings  compute_comparison {elapsed:7.2f}s"
+
+        if n <= args.reference:
+            start = time.perf_counter()
+            expected = pandas_correlations(albums)
+            reference = time.perf_counter() - start
+
+            correlations = comparison['correlations']
+            np.fill_diagonal(expected.values, np.nan)
+            np.testing.assert_allclose(correlations.to_numpy(), expected.loc[correlations.index, correlations.columns].to_numpy(), atol=1e-4)
+            line += f"  pandas corr {reference:7.2f}s  (correlations match)"
+
+        print(line)
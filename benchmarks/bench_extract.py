@@ -0,0 +1,63 @@
+# Peak memory and time of the in-memory and streaming project parsers
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from extract import parse_project, parse_project_stream
+from synthetic import make_payload
+
+
+def parse_in_memory(path):
+    """
+    The original path: load the whole document, then build the frames from it.
+    """
+    with open(path, 'rb') as file:
+        return parse_project(json.loads(file.read()))
+
+
+def measure(func, path):
+    """
+    Times one run, then traces the peak memory of a second one (tracing slows allocation down).
+    """
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare peak memory of parse_project and parse_project_stream.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000], help="synthetic history lengths")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            path = Path(tmp) / f'project-{n}.json'
+            path.write_text(json.dumps(make_payload(n)))
+
+            (old1, old2), old_time, old_peak = measure(parse_in_memory, path)
+            (new1, new2), new_time, new_peak = measure(parse_project_stream, path)
+
+            pd.testing.assert_frame_equal(old1, new1)
+            pd.testing.assert_frame_equal(old2, new2)
+
+            size = path.stat().st_size / 2**20
+            print(f"{n:>9,} albums ({size:7.1f} MiB)  in-memory {old_peak / 2**20:8.1f} MiB peak {old_time:6.2f}s  streaming {new_peak / 2**20:8.1f} MiB peak {new_time:6.2f}s  (outputs identical)")
@@ -0,0 +1,60 @@
+# Memory footprint of a project's albums frame in the compact dtypes against the original object and float64 dtypes
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dtypes import CATEGORY_COLUMNS, STRING_COLUMNS, frame_bytes, memory_report
+from extract import parse_project
+from transform import transform_music
+from synthetic import make_payload
+
+
+def legacy_albums(df2):
+    """
+    Converts a compact albums frame back to the dtypes it had before the schema layer: Python string objects,
+    text release dates, int64 positions and ratings and float64 everything else.
+    """
+    dtypes = {}
+    for col, dtype in df2.dtypes.items():
+        if col in STRING_COLUMNS or col in CATEGORY_COLUMNS or col == 'releaseDate':
+            dtypes[col] = object
+        elif pd.api.types.is_integer_dtype(dtype):
+            dtypes[col] = 'int64'
+        else:
+            dtypes[col] = 'float64'
+
+    legacy = df2.astype(dtypes)
+    legacy['releaseDate'] = [None if pd.isna(year) else str(year) for year in df2['releaseDate']]
+    return legacy
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare the memory held by a cached project in the compact and the original dtypes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_001, 10_000, 100_000], help="synthetic history lengths")
+    parser.add_argument('--report', action='store_true', help="print the per-column memory report of the first size")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    for i, n in enumerate(args.sizes):
+        start = time.perf_counter()
+        df1, df2 = transform_music(*parse_project(make_payload(n)))
+        elapsed = time.perf_counter() - start
+
+        legacy = legacy_albums(df2)
+        compact_bytes, legacy_bytes = frame_bytes(df1, df2), frame_bytes(df1, legacy)
+
+        print(f"{n:>9,} albums  legacy {legacy_bytes / 2**20:8.2f} MiB  compact {compact_bytes / 2**20:8.2f} MiB"
+              f"  ratio {legacy_bytes / compact_bytes:4.1f}x  projects per GiB {2**30 // legacy_bytes:>7,} -> {2**30 // compact_bytes:>7,}"
+              f"  (extract and transform {elapsed:.2f}s)")
+
+        if args.report and i == 0:
+            report = memory_report(df2).merge(memory_report(legacy), on='column', suffixes=('', '_legacy'))
+            print(report[['column', 'dtype_legacy', 'bytes_legacy', 'dtype', 'bytes']].to_string(index=False))
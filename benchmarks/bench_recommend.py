@@ -0,0 +1,52 @@
+# Benchmark and offline evaluation of the recommender on synthetic projects
+import sys
+import time
+import tempfile
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from recommend import build_index, evaluate, load_index, recommend, save_index
+from synthetic import make_ratings
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time the recommendation index and measure its RMSE on held-out ratings.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 5_000], help="numbers of projects")
+    parser.add_argument('--queries', type=int, default=200, help="projects recommended for per size")
+    parser.add_argument('--holdout', type=float, default=0.2, help="share of each project's ratings held out for evaluation")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        albums = make_ratings(n)
+        print(f"{n:,} projects, {len(albums):,} ratings")
+
+        index, build_time = timed(build_index, albums)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / 'index.npz'
+            _, save_time = timed(save_index, index, path)
+            size = path.stat().st_size
+            index, load_time = timed(load_index, path)
+
+        projects = albums.groupby('project_id', sort=False)
+        queries = [frame for _, (_, frame) in zip(range(args.queries), projects)]
+        _, query_time = timed(lambda: [recommend(index, frame) for frame in queries])
+
+        print(f"  build {build_time:6.2f}s  save {save_time * 1000:6.1f}ms  load {load_time * 1000:6.1f}ms  index {size / 2**20:5.1f} MiB")
+        print(f"  top-10 query {query_time / len(queries) * 1000:6.2f}ms per project ({np.mean([len(q) for q in queries]):,.0f} ratings each)")
+
+        results, evaluate_time = timed(evaluate, albums, args.holdout)
+        for row in results.itertuples():
+            print(f"  RMSE {row.model:<24} {row.rmse:.3f}")
+        print(f"  evaluated {results['ratings'].iloc[0]:,} held-out ratings in {evaluate_time:.2f}s")
@@ -0,0 +1,58 @@
+# Benchmark of the windowed rating statistics against one pandas rolling call per statistic
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from windows import EWM_SPANS, WINDOW_COLUMNS, WINDOWS, window_stats
+from synthetic import make_albums
+
+
+def pandas_window_stats(df2):
+    """
+    The reference statistics: a separate pandas rolling or ewm call per column, window and statistic.
+    """
+    stats = {}
+    for column in WINDOW_COLUMNS:
+        known = df2[column].dropna()
+        for window in WINDOWS:
+            stats[f'{column}Mean{window}'] = known.rolling(window).mean()
+        for window in WINDOWS:
+            stats[f'{column}Std{window}'] = known.rolling(window).std()
+        for span in EWM_SPANS:
+            stats[f'{column}Ewm{span}'] = known.ewm(span=span, adjust=False).mean()
+    return pd.DataFrame(stats).reindex(df2.index)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Compare window_stats with per-statistic pandas calls, in full and appended.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000], help="synthetic history lengths")
+    parser.add_argument('--append', type=int, default=10, help="albums appended to the history for the incremental update")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        _, df2 = make_albums(n + args.append)
+        history, appended = df2.iloc[:n], df2.iloc[n:]
+
+        expected, pandas_time = timed(pandas_window_stats, df2)
+        stats, full_time = timed(window_stats, df2)
+        pd.testing.assert_frame_equal(stats, expected, atol=1e-6)
+
+        # Appending recomputes only the new albums from the tail of the history
+        previous = history.join(window_stats(history))
+        appended_stats, append_time = timed(window_stats, appended, previous)
+        pd.testing.assert_frame_equal(appended_stats, stats.iloc[n:], atol=1e-6)
+
+        print(f"{n:>9,} albums  pandas {pandas_time:7.3f}s  window_stats {full_time:7.3f}s  speedup {pandas_time / full_time:5.1f}x"
+              f"  append {args.append} albums {append_time * 1000:6.2f}ms  (outputs identical)")
@@ -0,0 +1,87 @@
+# Local stand-in for the 1001albumsgenerator API serving canned project JSON
+import sys
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PREFIX = '/api/v1/projects/'
+
+
+def make_handler(payloads):
+    """
+    Builds a request handler serving payloads[project_id] as JSON, 404 for unknown projects.
+    Responses carry an ETag and honour If-None-Match with a 304.
+    """
+    class ProjectHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            project_id = self.path[len(PREFIX):] if self.path.startswith(PREFIX) else None
+            payload = payloads.get(project_id)
+
+            if payload is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+            etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:16])
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ProjectHandler
+
+
+@contextmanager
+def serve(payloads):
+    """
+    Serves the payloads on a free local port for the duration of the block.
+    Yields the API URL template to pass as base_url.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(payloads))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield f'http://127.0.0.1:{server.server_port}{PREFIX}{{}}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+
+    from extract import extract_projects
+    from synthetic import make_payload
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    payloads = {f'project-{i}': make_payload(1001, seed=i) for i in range(20)}
+
+    with serve(payloads) as base_url:
+        results = extract_projects(list(payloads) + ['missing-project'], base_url=base_url)
+
+    for project_id, result in results.items():
+        print(project_id, 'failed' if result is None else f'{len(result[1])} albums')
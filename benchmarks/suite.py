@@ -0,0 +1,206 @@
+# Benchmark suite of the ETL stages and the dashboard aggregates, saving JSON results to compare between commits
+import gc
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import datetime
+import itertools
+import platform
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pyarrow
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import album
+from album import connection_params, extract_music, load_music
+from aggregates import compute_aggregates
+from backfill import ensure_database, prepare_schema
+from extract import fetch_project_cached
+from transform import transform_music
+from synthetic import make_payload
+from stub_server import serve
+
+# Where each run's results are written, named after the commit and the time
+RESULTS_DIR = ROOT / 'benchmarks' / 'results'
+
+# Stand-in database the load benchmarks write to, created on the application's server if missing
+BENCH_DATABASE = 'music-app-bench'
+
+# Project id of the synthetic payloads
+BENCH_PROJECT = 'bench-project'
+
+# Parameters shaping the synthetic payloads; runs only compare on the same ones
+PAYLOAD_PARAMETERS = ['seed', 'genres', 'missing_images', 'missing_ratings', 'missing_global_ratings']
+
+# Slowdown of a benchmark's fastest run against the baseline's above which it is reported as a regression;
+# the fastest run is the one least disturbed by the rest of the machine
+REGRESSION_THRESHOLD = 1.25
+
+
+def measure(func, repeat):
+    """
+    Runs func once to warm up, then repeat times after a garbage collection each.
+    Returns the min, median, mean and max seconds and every run's time.
+    """
+    func()
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+
+    return {'min': min(runs), 'median': statistics.median(runs), 'mean': statistics.mean(runs), 'max': max(runs), 'runs': runs}
+
+
+def git_revision():
+    """
+    Returns the short commit hash of the working tree, with whether it has uncommitted changes.
+    """
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+
+    try:
+        return git('rev-parse', '--short', 'HEAD') or 'unknown', bool(git('status', '--porcelain', '--untracked-files=no'))
+    except OSError:
+        return 'unknown', False
+
+
+def run_suite(sizes, repeat, seed, genre_count, missing_images, missing_ratings, missing_global_ratings, dbname):
+    """
+    Times fetching a synthetic payload from the stub API, extract_music parsing it, transform_music, a full and an
+    unchanged incremental load_music into dbname, and the homepage's compute_aggregates, for every history length.
+    Without a reachable database the load benchmarks are left out. Yields one result dict per benchmark and size.
+    """
+    try:
+        ensure_database(dbname)
+        prepare_schema(dbname)
+        conn = psycopg2.connect(**connection_params(dbname))
+    except psycopg2.Error as e:
+        logging.warning(f"Skipping the load benchmarks, database {dbname} is unavailable: {e}")
+        conn = None
+
+    payloads = {}
+    try:
+        with serve(payloads) as base_url, tempfile.TemporaryDirectory() as tmp_dir:
+            for n in sizes:
+                payloads[BENCH_PROJECT] = make_payload(n, seed, missing_images, missing_ratings, genre_count, missing_global_ratings)
+
+                # Every fetch starts from an empty cache, so none is answered with a 304
+                cache_dirs = (Path(tmp_dir) / str(n) / str(i) for i in itertools.count())
+                fetch = lambda: fetch_project_cached(BENCH_PROJECT, base_url=base_url, cache_dir=next(cache_dirs))
+                yield dict(benchmark='fetch', albums=n, rows=n, **measure(fetch, repeat))
+
+                path, _ = fetch_project_cached(BENCH_PROJECT, base_url=base_url, cache_dir=Path(tmp_dir) / str(n) / 'payload')
+                yield dict(benchmark='extract', albums=n, rows=n, **measure(lambda: extract_music(path, BENCH_PROJECT), repeat))
+
+                df1, df2 = extract_music(path, BENCH_PROJECT)
+                yield dict(benchmark='transform', albums=n, rows=n, **measure(lambda: transform_music(df1.copy(), df2.copy()), repeat))
+
+                df1, df2 = transform_music(df1, df2)
+
+                if conn is not None:
+                    def load(incremental):
+                        if not load_music(df1, df2, incremental=incremental, project_id=BENCH_PROJECT, conn=conn, schema=False):
+                            raise RuntimeError("Benchmark load failed, see the log.")
+
+                    yield dict(benchmark='load_full', albums=n, rows=len(df2), **measure(lambda: load(False), repeat))
+                    yield dict(benchmark='load_unchanged', albums=n, rows=len(df2), **measure(lambda: load(True), repeat))
+
+                # As homepage.py prepares a project fetched live from the API
+                albums = df2.rename(columns=lambda col: col.strip().lower())
+                yield dict(benchmark='aggregates', albums=n, rows=len(albums), **measure(lambda: compute_aggregates(albums), repeat))
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints each benchmark's fastest run against the baseline's. Returns the benchmarks slower than threshold times it.
+    """
+    previous = {(row['benchmark'], row['albums']): row for row in baseline['results']}
+    regressions = []
+
+    print(f"\nAgainst {baseline['commit']} ({baseline['created_at']}):")
+    for row in results:
+        before = previous.get((row['benchmark'], row['albums']))
+        if before is None:
+            continue
+        ratio = row['min'] / before['min']
+        flag = ''
+        if ratio > threshold:
+            regressions.append(row)
+            flag = '  REGRESSION'
+        print(f"  {row['benchmark']:<15} {row['albums']:>9,} albums  {before['min'] * 1000:9.2f}ms -> {row['min'] * 1000:9.2f}ms  {ratio:5.2f}x{flag}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time the ETL stages and the dashboard aggregates on synthetic projects and save the results as JSON.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_001, 10_000, 50_000], help="synthetic history lengths")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per benchmark, after one warm-up run")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic payloads")
+    parser.add_argument('--genres', type=int, help="number of distinct genre names (default: the fixed GENRES and SUBGENRES lists)")
+    parser.add_argument('--missing-images', type=float, default=0.05, help="share of albums without a cover")
+    parser.add_argument('--missing-ratings', type=float, default=0.1, help="share of albums without a rating")
+    parser.add_argument('--missing-global-ratings', type=float, default=0.02, help="share of albums without a global rating")
+    parser.add_argument('--database', default=BENCH_DATABASE, help=f"database the load benchmarks write to (default: {BENCH_DATABASE})")
+    parser.add_argument('--host', default=album.hostname, help="PostgreSQL host or socket directory")
+    parser.add_argument('--port', type=int, default=album.port_id, help="PostgreSQL port")
+    parser.add_argument('--user', default=album.username, help="PostgreSQL user")
+    parser.add_argument('--password', default=album.pwd, help="PostgreSQL password")
+    parser.add_argument('--output', help=f"results file (default: a new file in {RESULTS_DIR})")
+    parser.add_argument('--compare', help="earlier results file to compare the fastest runs against")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help="slowdown of the fastest run reported as a regression")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    album.hostname, album.port_id, album.username, album.pwd = args.host, args.port, args.user, args.password
+
+    commit, dirty = git_revision()
+    created_at = datetime.datetime.now(datetime.timezone.utc)
+
+    results = []
+    for row in run_suite(args.sizes, args.repeat, args.seed, args.genres, args.missing_images, args.missing_ratings, args.missing_global_ratings, args.database):
+        results.append(row)
+        print(f"{row['benchmark']:<15} {row['albums']:>9,} albums  median {row['median'] * 1000:9.2f}ms  min {row['min'] * 1000:9.2f}ms"
+              f"  max {row['max'] * 1000:9.2f}ms  {row['rows'] / row['median']:>12,.0f} rows/s")
+
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': created_at.isoformat(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'versions': {'pandas': pd.__version__, 'numpy': np.__version__, 'pyarrow': pyarrow.__version__, 'psycopg2': psycopg2.__version__},
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('password', 'output', 'compare', 'threshold')},
+        'results': results
+    }
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{created_at:%Y%m%dT%H%M%S}-{commit}{'-dirty' if dirty else ''}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        changed = [key for key in PAYLOAD_PARAMETERS if baseline['parameters'].get(key) != report['parameters'][key]]
+        if changed:
+            logging.warning(f"The baseline was run with other {', '.join(changed)}, so it timed other payloads.")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+GENRES = ['Rock', 'Pop', 'Jazz', 'Folk', 'Soul', 'Blues', 'Electronic', 'Hip Hop', 'Metal', 'Punk', 'Country', 'Reggae']
+SUBGENRES = ['Art Rock', 'Indie Pop', 'Bebop', 'Post-Punk', 'Shoegaze', 'Dream Pop', 'Funk', 'Grunge', 'Krautrock', 'Trip Hop', 'Rock', 'Pop']
+ORIGINS = ['us', 'uk', 'de', 'fr', 'br', 'jp', 'ca']
+
+# Albums of the 1001 Albums list every project draws its history from
+ALBUMS = 1001
+
+
+def make_albums(n, seed=0):
+    """
+    Builds synthetic (current, albums_df) frames shaped like the output of extract_music.
+    """
+    rng = np.random.default_rng(seed)
+
+    genres = np.array(GENRES, dtype=object)
+    subgenres = np.array(SUBGENRES, dtype=object)
+    n_genres = rng.integers(0, 4, n)
+    n_subgenres = rng.integers(0, 4, n)
+
+    ratings = rng.integers(1, 6, n).astype(float)
+    ratings[rng.random(n) < 0.1] = np.nan
+
+    albums_df = pd.DataFrame({
+        'artist': [f'Artist {i}' for i in rng.integers(0, max(n // 3, 1), n)],
+        'name': [f'Album {i}' for i in range(n)],
+        'artistOrigin': rng.choice(ORIGINS, n),
+        'releaseDate': rng.integers(1950, 2025, n).astype(str),
+        'images': [f'https://i.scdn.co/image/{i}' for i in range(n)],
+        'genres': [list(rng.choice(genres, k, replace=False)) for k in n_genres],
+        'subGenres': [list(rng.choice(subgenres, k, replace=False)) for k in n_subgenres],
+        'rating': ratings,
+        'globalRating': np.where(rng.random(n) < 0.02, np.nan, rng.uniform(2, 4.5, n).round(2)),
+        'review': rng.choice(['', 'Great record', 'Not for me/skip'], n),
+        'youtubeMusicId': [f'OLAK5uy_{i}' for i in range(n)]
+    })
+
+    current = pd.DataFrame({
+        'artist': 'Artist 0',
+        'artistOrigin': 'uk',
+        'images': 'https://i.scdn.co/image/current',
+        'genres': [['Rock', 'Pop']],
+        'subGenres': [['Art Rock']],
+        'name': 'Current Album',
+        'releaseDate': '1973',
+        'youtubeMusicId': 'OLAK5uy_current',
+        'spotifyId': 'spotify_current'
+    }, index=[0])
+
+    return current, albums_df
+
+
+def make_album(i, rng, genres=GENRES, subgenres=SUBGENRES, missing_images=0.05):
+    """
+    Builds one synthetic album as found in the API's 'currentAlbum' and 'history[].album'.
+    """
+    images = [] if rng.random() < missing_images else [{'url': f'https://i.scdn.co/image/{i}', 'width': 640, 'height': 640}]
+
+    return {
+        'artist': f'Artist {i % 400}',
+        'artistOrigin': str(rng.choice(ORIGINS)),
+        'images': images,
+        'genres': [str(g) for g in rng.choice(genres, rng.integers(0, 4), replace=False)],
+        'subGenres': [str(g) for g in rng.choice(subgenres, rng.integers(0, 4), replace=False)],
+        'name': f'Album {i}',
+        'releaseDate': str(rng.integers(1950, 2025)),
+        'youtubeMusicId': f'OLAK5uy_{i}',
+        'spotifyId': f'spotify_{i}'
+    }
+
+
+def make_payload(n, seed=0, missing_images=0.05, missing_ratings=0.1, genre_count=None, missing_global_ratings=0.02):
+    """
+    Builds a synthetic project JSON payload with a history of n albums.
+    missing_global_ratings is the share of albums without a global rating, as for albums nobody else rated yet.
+    With genre_count, genres and subgenres are drawn from that many generated names instead of GENRES and SUBGENRES.
+    """
+    rng = np.random.default_rng(seed)
+
+    genres, subgenres = GENRES, SUBGENRES
+    if genre_count is not None:
+        # Albums draw up to three genres of each kind without replacement
+        genres = subgenres = [f'Genre {i}' for i in range(max(genre_count, 3))]
+
+    history = []
+    for i in range(n):
+        rating = None if rng.random() < missing_ratings else int(rng.integers(1, 6))
+        global_rating = None if rng.random() < missing_global_ratings else round(float(rng.uniform(2, 4.5)), 2)
+        history.append({
+            'album': make_album(i, rng, genres, subgenres, missing_images),
+            'rating': rating,
+            'globalRating': global_rating,
+            'review': str(rng.choice(['', 'Great record', 'Not for me/skip'])),
+            'generatedAt': f'2024-01-01T00:00:00.{i:06d}Z'
+        })
+
+    return {
+        'name': f'Project {seed}',
+        'shareableUrl': f'https://1001albumsgenerator.com/shared/{seed}',
+        'currentAlbum': make_album(n, rng, genres, subgenres, missing_images=0),
+        'currentAlbumNotes': '',
+        'updateFrequency': 'dailyWithWeekends',
+        'history': history
+    }
+
+
+def make_ratings(projects, albums=ALBUMS, seed=0):
+    """
+    Builds the rated albums of synthetic projects, shaped like the rows of compare.COMPARISON_QUERY
+    and recommend.RECOMMEND_QUERY. Each project has a history of random length, and rates each album
+    from its global rating, the project's taste for the album's first genre and origin, and some noise.
+    """
+    rng = np.random.default_rng(seed)
+
+    genres = np.array(GENRES + SUBGENRES, dtype=object)
+    origins = np.array(ORIGINS, dtype=object)
+    album_genres = rng.integers(0, len(genres), (albums, 2))
+    album_origins = rng.integers(0, len(origins), albums)
+    release_years = rng.integers(1950, 2025, albums)
+    global_ratings = rng.uniform(2, 4.5, albums).round(2)
+    genre_tastes = rng.normal(0, 0.8, (projects, len(genres)))
+    origin_tastes = rng.normal(0, 0.4, (projects, len(origins)))
+
+    lengths = rng.integers(50, albums + 1, projects)
+    project_codes = np.repeat(np.arange(projects), lengths)
+    album_codes = np.concatenate([rng.permutation(albums)[:n] for n in lengths])
+
+    ratings = (
+        global_ratings[album_codes]
+        + genre_tastes[project_codes, album_genres[album_codes, 0]]
+        + origin_tastes[project_codes, album_origins[album_codes]]
+        + rng.normal(0, 0.7, len(album_codes))
+    )
+
+    return pd.DataFrame({
+        'project_id': np.char.add('project-', project_codes.astype(str)),
+        'artist': np.char.add('Artist ', (album_codes % 400).astype(str)),
+        'name': np.char.add('Album ', album_codes.astype(str)),
+        'allgenres': [', '.join(sorted(set(pair))) for pair in genres[album_genres[album_codes]]],
+        'artistorigin': origins[album_origins[album_codes]],
+        'releasedate': release_years[album_codes].astype(str),
+        'rating': np.clip(np.rint(ratings), 1, 5).astype(int),
+        'globalrating': global_ratings[album_codes]
+    })
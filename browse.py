@@ -0,0 +1,113 @@
+from sqlalchemy import text
+from aggregates import TREND_COLUMNS
+
+# Albums per page of the history browser
+PAGE_SIZE = 50
+
+# Columns shown by the history browser
+BROWSE_COLUMNS = ['position', 'artist', 'name', 'artistorigin', 'releasedate', 'allgenres', 'rating', 'globalrating', 'streak', 'review']
+
+# Sort key expression of each sortable column. NULLs are folded into a sentinel so keyset comparisons
+# never see them; album.create_indexes builds a matching (key, position) index for each one.
+SORT_KEYS = {
+    'position': 'position',
+    'artist': "COALESCE(artist, '')",
+    'name': "COALESCE(name, '')",
+    'artistorigin': "COALESCE(artistorigin, '')",
+    'releasedate': 'COALESCE(releasedate, -1)',
+    'rating': 'COALESCE(rating, -1)',
+    'globalrating': 'COALESCE(globalrating, -1)',
+    'streak': 'COALESCE(streak, -1)'
+}
+
+# Albums per genre of a project, counted over the 'album_genres' bridge table written by album.load_genres; ties by
+# code point, the order compute_aggregates sorts the names in
+GENRE_COUNTS_QUERY = '''
+    SELECT g.genre, c.count
+    FROM (SELECT genre_id, COUNT(*) AS count FROM album_genres WHERE project_id = :project_id GROUP BY genre_id) c
+    JOIN genres g USING (genre_id)
+    ORDER BY c.count DESC, g.genre COLLATE "C"
+'''
+
+# Windowed rating statistics of a project's albums in history order, stored per album by the ETL, see windows.window_stats
+RATING_TREND_QUERY = f'''
+    SELECT {', '.join(TREND_COLUMNS)}
+    FROM albums
+    WHERE project_id = :project_id
+    ORDER BY position
+'''
+
+
+def history_filters(project_id, genre=None, decade=None, origin=None, rating=None):
+    """
+    Builds the WHERE clauses and bind parameters selecting a project's albums with the history filters;
+    None means no filter. decade is the first year of the decade, rating a (min, max) pair.
+    """
+    clauses = ['project_id = :project_id']
+    params = {'project_id': project_id}
+
+    if genre is not None:
+        clauses.append('''EXISTS (
+            SELECT 1 FROM album_genres ag JOIN genres g USING (genre_id)
+            WHERE ag.project_id = albums.project_id AND ag.position = albums.position AND g.genre = :genre
+        )''')
+        params['genre'] = genre
+
+    if decade is not None:
+        clauses.append('releasedate >= :decade_start AND releasedate < :decade_end')
+        params['decade_start'] = decade
+        params['decade_end'] = decade + 10
+
+    if origin is not None:
+        clauses.append('artistorigin = :origin')
+        params['origin'] = origin
+
+    if rating is not None:
+        clauses.append('rating BETWEEN :rating_min AND :rating_max')
+        params['rating_min'], params['rating_max'] = rating
+
+    return clauses, params
+
+
+def history_page_query(project_id, sort='position', descending=False, after=None, limit=PAGE_SIZE, **filters):
+    """
+    Builds the query of one page of a project's albums using keyset pagination: after is the (sort_key, position)
+    of the last row of the previous page, so every page is an index range scan whatever its depth.
+    Returns (query, params); the rows carry their sort_key for the next cursor.
+    """
+    key = SORT_KEYS[sort]
+    clauses, params = history_filters(project_id, **filters)
+
+    if after is not None:
+        clauses.append(f"({key}, position) {'<' if descending else '>'} (:after_key, :after_position)")
+        params['after_key'], params['after_position'] = after
+
+    where = ' AND '.join(clauses)
+    direction = 'DESC' if descending else 'ASC'
+    params['limit'] = limit
+
+    query = f'''
+        SELECT {', '.join(BROWSE_COLUMNS)}, {key} AS sort_key
+        FROM albums
+        WHERE {where}
+        ORDER BY {key} {direction}, position {direction}
+        LIMIT :limit
+    '''
+    return text(query), params
+
+
+def history_count_query(project_id, **filters):
+    """
+    Builds the query counting the project's albums that match the filters.
+    Returns (query, params).
+    """
+    clauses, params = history_filters(project_id, **filters)
+    return text(f"SELECT COUNT(*) AS count FROM albums WHERE {' AND '.join(clauses)}"), params
+
+
+def next_cursor(page):
+    """
+    Returns the cursor that continues after the last row of a page, as plain Python values.
+    """
+    last = page.iloc[-1]
+    return last['sort_key'].item() if hasattr(last['sort_key'], 'item') else last['sort_key'], int(last['position'])
@@ -0,0 +1,244 @@
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from images import DECADE_SIZE, FLAG_SIZE, image_data_uri
+
+# Most figures kept in process; each dashboard draws three per project
+FIGURE_CACHE_SIZE = 64
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+_figure_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def content_key(*inputs):
+    """
+    Hashes the content of the chart inputs: DataFrames by their values, index and columns, anything else by repr.
+    """
+    digest = hashlib.sha256()
+    for value in inputs:
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        else:
+            digest.update(repr(value).encode())
+    return digest.hexdigest()
+
+
+def cached_figure(name, builder, *inputs):
+    """
+    Returns builder(*inputs) from an in-process LRU cache keyed by the chart name and the content of its inputs.
+    The cached figures are shared between reruns and sessions, so callers must not modify them.
+    """
+    start = time.perf_counter()
+    key = (name, content_key(*inputs))
+
+    with _figures_lock:
+        result = _figures.get(key)
+        if result is not None:
+            _figures.move_to_end(key)
+            _figure_stats['hits'] += 1
+
+    if result is not None:
+        logging.info(f"Chart '{name}' served from cache in {(time.perf_counter() - start) * 1000:.1f} ms.")
+        return result
+
+    result = builder(*inputs)
+
+    with _figures_lock:
+        _figure_stats['misses'] += 1
+        _figures[key] = result
+        _figures.move_to_end(key)
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+            _figure_stats['evictions'] += 1
+
+    logging.info(f"Chart '{name}' built in {(time.perf_counter() - start) * 1000:.1f} ms.")
+
+    return result
+
+
+def figure_cache_stats():
+    """
+    Returns the figure cache counters.
+    """
+    with _figures_lock:
+        return dict(_figure_stats, figures=len(_figures))
+
+
+def decade_figure(decade_counts):
+    """
+    Builds the albums per decade chart, each bar drawn as its decade image.
+    Returns (figure, missing image path), falling back to a plain bar chart when an image is missing.
+    """
+    plot_df_decades = decade_counts.copy()
+
+    # Generate image paths for each decade, assuming they are in an 'assets' folder
+    plot_df_decades['image_path'] = plot_df_decades['decade'].apply(lambda d: f"assets/{d}.jpg")
+
+    # Check if all decade images exist, downsizing them on first use, otherwise fallback to a bar chart
+    missing_image = None
+    for image_path in plot_df_decades['image_path']:
+        try:
+            image_data_uri(image_path, DECADE_SIZE)
+        except FileNotFoundError:
+            missing_image = image_path
+            break
+
+    if missing_image is not None:
+        fig_decades = px.bar(plot_df_decades, x='decade', y='count', text='count', color_discrete_sequence=['#636EFA'], category_orders={"decade": sorted(plot_df_decades['decade'])})
+        fig_decades.update_traces(textposition='outside')
+    else:
+        fig_decades = go.Figure()
+        fig_decades.add_trace(go.Bar(
+            x=plot_df_decades['decade'], y=plot_df_decades['count'], text=plot_df_decades['count'],
+            textposition='outside', marker_color='rgba(0,0,0,0)'
+        ))
+        for _, row in plot_df_decades.iterrows():
+            fig_decades.add_layout_image(
+                source=image_data_uri(row['image_path'], DECADE_SIZE),
+                xref="x", yref="y", x=row['decade'], y=row['count'] / 2,
+                sizex=0.8, sizey=row['count'],
+                xanchor="center", yanchor="middle",
+                sizing="stretch", layer="below"
+            )
+
+    max_count_decades = plot_df_decades['count'].max()
+    fig_decades.update_layout(yaxis_title="Number of Albums", showlegend=False, template="plotly_white", xaxis={'categoryorder': 'category ascending'})
+    fig_decades.update_yaxes(dtick=1, range=[0, max_count_decades * 1.15 if max_count_decades > 0 else 1])
+    fig_decades.update_xaxes(tickfont_size=17)
+
+    return fig_decades, missing_image
+
+
+def genre_figure(genre_counts):
+    """
+    Builds the top 10 genres bar chart.
+    """
+    most_common_genres = genre_counts.head(10)
+    fig2 = px.bar(x=most_common_genres['genre'], y=most_common_genres['count'], labels={'x': 'Genre', 'y': 'Count'})
+    # Customize colors, make barsize bigger and make xlabel bigger
+    fig2.update_yaxes(title_text='Number of Albums', dtick=1)
+    color = px.colors.qualitative.Plotly
+    fig2.update_layout(showlegend=False)
+    fig2.update_traces(marker_color=color, marker_line_color='rgb(8,48,107)', marker_line_width=1.5, opacity=0.8)
+    fig2.update_xaxes(tickangle=-45, title_text=None, tickfont_size=14)
+
+    return fig2
+
+
+def origin_figure(origin_counts, total_albums):
+    """
+    Builds the USA / UK / Other pie chart with a flag over each slice.
+    Returns (figure, missing flag paths); the figure is None when there is no location data.
+    """
+    # Get counts for USA, UK, and Other
+    origin_counts = origin_counts.set_index('artistorigin')['count']
+    usa_data = int(origin_counts.get('us', 0))
+    uk_data = int(origin_counts.get('uk', 0))
+    other_data = total_albums - usa_data - uk_data
+
+    # Data for plotting
+    origins = ['USA', 'UK', 'Other']
+    counts = [usa_data, uk_data, other_data]
+    flag_paths = ['assets/us_flag.png', 'assets/uk_flag.jpg', 'assets/other_flag.jpg']
+
+    # Filter out origins with 0 albums and prepare data for plotting
+    plot_data = [{'origin': o, 'count': c, 'flag': f} for o, c, f in zip(origins, counts, flag_paths) if c > 0]
+
+    if not plot_data:
+        return None, []
+
+    plot_df = pd.DataFrame(plot_data)
+
+    # Check if all flag images exist, downsizing them on first use
+    missing_flags = []
+    for flag_path in plot_df['flag']:
+        try:
+            image_data_uri(flag_path, FLAG_SIZE)
+        except FileNotFoundError:
+            # We don't break, so the pie chart still renders without images.
+            missing_flags.append(flag_path)
+
+    # Define a color map for the pie chart slices
+    color_map = {'USA': '#ff4d4d', 'UK': '#636EFA', 'Other': 'white'}
+    plot_colors = plot_df['origin'].map(color_map).tolist()
+
+    # Create the pie chart
+    fig_location = go.Figure(go.Pie(
+        labels=plot_df['origin'],
+        values=plot_df['count'],
+        hoverinfo='label+value+percent',
+        textinfo='percent',
+        marker=dict(colors=plot_colors),
+        sort=False
+    ))
+
+    # If images exist, overlay them on the pie chart
+    if not missing_flags:
+        # Make the percentage text on the slices transparent to not clash with the image
+        fig_location.update_traces(textfont=dict(color='rgba(0,0,0,0)'))
+
+        total_count = plot_df['count'].sum()
+        cumulative_percent = 0
+        normalized_values = plot_df['count'] / total_count
+
+        for i, val in enumerate(normalized_values):
+            # Calculate the middle angle of the slice
+            slice_angle = val * 2 * math.pi
+            mid_angle = (cumulative_percent * 2 * math.pi) + (slice_angle / 2)
+
+            # Position the image inside the slice. The pie is in a [0,1] x [0,1] paper domain.
+            # Center is (0.5, 0.5). We place the image at a certain radius from the center.
+            radius = 0.35  # Adjust this to position the image
+            x_pos = 0.5 + radius * math.cos(mid_angle)
+            y_pos = 0.5 + radius * math.sin(mid_angle)
+
+            fig_location.add_layout_image(
+                source=image_data_uri(plot_df['flag'].iloc[i], FLAG_SIZE),
+                xref="paper", yref="paper",
+                x=x_pos, y=y_pos,
+                sizex=0.2, sizey=0.2,  # Adjust size as needed
+                xanchor="center", yanchor="middle",
+                sizing="contain", layer="above"
+            )
+            cumulative_percent += val
+
+    fig_location.update_layout(
+        showlegend=True,
+        template="plotly_white",
+    )
+
+    return fig_location, missing_flags
+
+
+def trend_figure(rating_trend, window):
+    """
+    Builds the rating trend chart over the listening history: the rolling mean of the ratings with a band
+    of one standard deviation, their weighted mean, and the rolling mean of the global ratings of the same albums.
+    """
+    x = rating_trend['position'] + 1
+    mean = rating_trend[f'ratingmean{window}']
+    std = rating_trend[f'ratingstd{window}']
+
+    fig_trend = go.Figure()
+    fig_trend.add_trace(go.Scatter(
+        x=pd.concat([x, x[::-1]]), y=pd.concat([mean + std, (mean - std)[::-1]]),
+        fill='toself', fillcolor='rgba(99,110,250,0.15)', line=dict(width=0),
+        hoverinfo='skip', showlegend=False
+    ))
+    fig_trend.add_trace(go.Scatter(x=x, y=mean, name=f"My rating ({window} albums)", line=dict(color='#636EFA', width=2)))
+    fig_trend.add_trace(go.Scatter(x=x, y=rating_trend[f'ratingewm{window}'], name="My rating (weighted)", line=dict(color='#636EFA', width=1, dash='dot')))
+    fig_trend.add_trace(go.Scatter(x=x, y=rating_trend[f'globalratingmean{window}'], name=f"Global rating ({window} albums)", line=dict(color='#ff4d4d', width=2)))
+
+    fig_trend.update_layout(template="plotly_white", hovermode='x unified', legend=dict(orientation='h', y=-0.2))
+    fig_trend.update_xaxes(title_text="Album")
+    fig_trend.update_yaxes(title_text="Rating", range=[0.5, 5.5], dtick=1)
+
+    return fig_trend
@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+# Rated albums of every loaded project; albums are matched across projects by artist and name
+COMPARISON_QUERY = '''
+    SELECT project_id, artist, name, allGenres, rating, globalRating
+    FROM albums
+    WHERE rating IS NOT NULL
+'''
+
+# Albums two projects must both have rated before their ratings are correlated
+MIN_COMMON_ALBUMS = 20
+
+# Albums of a genre a project must have rated before its genre average is reported
+MIN_GENRE_ALBUMS = 5
+
+# Projects correlated per block, so the intermediate matrices stay at block x projects
+CORRELATION_BLOCK = 512
+
+LEADERBOARD_COLUMNS = ['project_id', 'albums_rated', 'average_rating', 'generosity', 'mean_abs_diff', 'global_agreement', 'average_similarity']
+
+
+def album_codes(albums):
+    """
+    Numbers the albums of the rated albums frame by artist and name, the same album sharing one code across projects.
+    Returns (album code of every row, album (artist, name) index).
+    """
+    artist_codes, artists = pd.factorize(albums['artist'].fillna(''))
+    name_codes, names = pd.factorize(albums['name'].fillna(''))
+
+    # Factorizing the two integer codes is much cheaper than factorizing the pairs of strings
+    codes, pairs = pd.factorize(artist_codes.astype(np.int64) * len(names) + name_codes)
+    album_index = pd.MultiIndex.from_arrays([artists[pairs // len(names)], names[pairs % len(names)]], names=['artist', 'name'])
+
+    return codes, album_index
+
+
+def rating_matrix(albums, codes, n_albums):
+    """
+    Pivots the rated albums of every project into a dense project x album rating matrix, NaN where unrated.
+    Returns (project ids, ratings, global rating of each album).
+    """
+    project_codes, projects = pd.factorize(albums['project_id'], sort=True)
+
+    ratings = np.full((len(projects), n_albums), np.nan, dtype=np.float32)
+    ratings[project_codes, codes] = albums['rating'].to_numpy(dtype=np.float32)
+
+    # The global rating belongs to the album, but is snapshotted per project when its history was fetched
+    global_ratings = np.bincount(codes, albums['globalrating'].fillna(0).to_numpy(), n_albums)
+    counts = np.bincount(codes, albums['globalrating'].notna().to_numpy(), n_albums)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        global_ratings = (global_ratings / counts).astype(np.float32)
+
+    return pd.Index(projects, name='project_id'), ratings, global_ratings
+
+
+def genre_matrix(albums, codes, n_albums):
+    """
+    Builds the album x genre indicator matrix from the 'allGenres' of the first row of every album.
+    Returns (genre names, indicator matrix).
+    """
+    _, first_rows = np.unique(codes, return_index=True)
+
+    genres = albums['allgenres'].iloc[first_rows].fillna('').str.split(', ').set_axis(codes[first_rows]).explode()
+    genres = genres[genres.ne('')]
+    genre_codes, genre_names = pd.factorize(genres, sort=True)
+
+    indicator = np.zeros((n_albums, len(genre_names)), dtype=np.float32)
+    indicator[genres.index.to_numpy(dtype=np.int64), genre_codes] = 1
+
+    return pd.Index(genre_names, name='genre'), indicator
+
+
+def rating_correlations(ratings, min_common=MIN_COMMON_ALBUMS, block_size=CORRELATION_BLOCK):
+    """
+    Computes the Pearson correlation of every pair of projects over the albums both rated, as matrix products
+    of the masked ratings. Pairs with fewer than min_common albums in common, or constant ratings, are NaN.
+    """
+    rated = ~np.isnan(ratings)
+    mask = rated.astype(np.float32)
+    values = np.where(rated, ratings, 0).astype(np.float32)
+    squares = values * values
+
+    correlations = np.full((len(ratings), len(ratings)), np.nan, dtype=np.float32)
+
+    # The matrix is symmetric: each block of rows is only correlated with itself and the projects after it
+    for start in range(0, len(ratings), block_size):
+        rows = slice(start, start + block_size)
+        cols = slice(start, None)
+
+        # Counts and sums over the albums each pair has in common: x are the block's ratings, y the other project's
+        common = mask[rows] @ mask[cols].T
+        sum_x = values[rows] @ mask[cols].T
+        sum_y = mask[rows] @ values[cols].T
+        sum_xx = squares[rows] @ mask[cols].T
+        sum_yy = mask[rows] @ squares[cols].T
+        sum_xy = values[rows] @ values[cols].T
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = sum_xy - sum_x * sum_y / common
+            variance_x = sum_xx - sum_x * sum_x / common
+            variance_y = sum_yy - sum_y * sum_y / common
+            block = np.clip(covariance / np.sqrt(variance_x * variance_y), -1, 1)
+
+        # Single precision sums leave a small residue where the ratings are constant
+        block[(common < min_common) | ~(variance_x > 1e-3) | ~(variance_y > 1e-3)] = np.nan
+        correlations[rows, cols] = block
+        correlations[cols, rows] = block.T
+
+    return correlations
+
+
+def global_agreement(ratings, global_ratings):
+    """
+    Compares every project's ratings with the global ratings of the same albums.
+    Returns per-project arrays: (generosity, mean absolute difference, Pearson correlation).
+    """
+    rated = ~np.isnan(ratings)
+    counts = rated.sum(axis=1)
+    diffs = np.where(rated, ratings - global_ratings, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        generosity = diffs.sum(axis=1) / counts
+        mean_abs_diff = np.abs(diffs).sum(axis=1) / counts
+
+        # Center both sides on the project's own rated albums
+        x = np.where(rated, ratings, 0)
+        y = np.where(rated, global_ratings, 0)
+        x = np.where(rated, x - (x.sum(axis=1) / counts)[:, None], 0)
+        y = np.where(rated, y - (y.sum(axis=1) / counts)[:, None], 0)
+        correlation = (x * y).sum(axis=1) / np.sqrt((x * x).sum(axis=1) * (y * y).sum(axis=1))
+
+    return generosity, mean_abs_diff, correlation
+
+
+def genre_averages(ratings, genres, min_albums=MIN_GENRE_ALBUMS):
+    """
+    Averages every project's ratings per genre with two matrix products against the album x genre indicator.
+    Averages over fewer than min_albums albums are NaN.
+    """
+    rated = ~np.isnan(ratings)
+    sums = np.where(rated, ratings, 0) @ genres
+    counts = rated.astype(np.float32) @ genres
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        averages = sums / counts
+
+    averages[counts < min_albums] = np.nan
+    return averages
+
+
+def compute_comparison(albums, min_common=MIN_COMMON_ALBUMS, min_genre_albums=MIN_GENRE_ALBUMS):
+    """
+    Compares every project from the rated albums of all of them (see COMPARISON_QUERY).
+    Returns a dict of DataFrames: leaderboard (one row per project), correlations (project x project)
+    and genre_averages (project x genre).
+    """
+    albums = albums.rename(columns=str.lower)
+
+    codes, album_index = album_codes(albums)
+    projects, ratings, global_ratings = rating_matrix(albums, codes, len(album_index))
+    genre_names, genres = genre_matrix(albums, codes, len(album_index))
+
+    correlations = rating_correlations(ratings, min_common)
+    np.fill_diagonal(correlations, np.nan)
+
+    generosity, mean_abs_diff, agreement = global_agreement(ratings, global_ratings)
+
+    correlated = ~np.isnan(correlations)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        similarity = np.where(correlated, correlations, 0).sum(axis=1) / correlated.sum(axis=1)
+
+    leaderboard = pd.DataFrame({
+        'project_id': projects,
+        'albums_rated': (~np.isnan(ratings)).sum(axis=1),
+        'average_rating': np.nanmean(ratings, axis=1),
+        'generosity': generosity,
+        'mean_abs_diff': mean_abs_diff,
+        'global_agreement': agreement,
+        'average_similarity': similarity
+    })[LEADERBOARD_COLUMNS]
+
+    return {
+        'leaderboard': leaderboard,
+        'correlations': pd.DataFrame(correlations, index=projects, columns=projects),
+        'genre_averages': pd.DataFrame(genre_averages(ratings, genres, min_genre_albums), index=projects, columns=genre_names)
+    }
+
+
+def leaderboard(comparison, column, n=10, ascending=False):
+    """
+    Returns the n projects ranked first by one leaderboard column, skipping projects without a value.
+    """
+    board = comparison['leaderboard'].dropna(subset=[column])
+    board = board.sort_values([column, 'project_id'], ascending=[ascending, True], kind='stable').head(n)
+    return board.assign(rank=range(1, len(board) + 1)).set_index('rank')
+
+
+def most_similar(comparison, project_id, n=10):
+    """
+    Returns the n projects whose ratings correlate best with the given project's.
+    """
+    similar = comparison['correlations'].loc[project_id].dropna().sort_values(ascending=False, kind='stable').head(n)
+    return similar.rename('correlation').reset_index()
+
+
+def genre_leaders(comparison, n=3):
+    """
+    Returns, for every genre, the n projects with the highest average rating of its albums.
+    """
+    averages = comparison['genre_averages'].rename_axis(columns='genre').stack().rename('average_rating').reset_index()
+    averages = averages.sort_values(['genre', 'average_rating', 'project_id'], ascending=[True, False, True], kind='stable')
+    return averages.groupby('genre').head(n).reset_index(drop=True)
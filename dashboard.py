@@ -0,0 +1,373 @@
+import time
+import streamlit as st
+import streamlit.components.v1 as components
+import pandas as pd
+from sqlalchemy import text
+from browse import GENRE_COUNTS_QUERY, RATING_TREND_QUERY
+from charts import cached_figure, decade_figure, genre_figure, origin_figure, trend_figure
+from aggregates import get_highlights
+from images import cover_image
+from windows import WINDOWS
+import profiling
+
+# Project shown by the personal dashboard
+DEFAULT_PROJECT_ID = "um-ano-e-meio-de-musica"
+
+# How often a project's load version is re-checked, in seconds
+VERSION_CHECK_TTL = 60
+
+# Monotonic time until which the database is not asked again after a failed version check, so pages
+# falling back to the API do not wait on a connection attempt every rerun
+_database_down_until = 0.0
+
+# Projects whose tables are kept in memory, across every session of the process
+CACHED_PROJECTS = 256
+
+# Precomputed aggregates written by the ETL, see album.load_aggregates and album.load_genres
+SUMMARY_QUERIES = {
+    'kpis': 'SELECT * FROM summary_kpis WHERE project_id = :project_id',
+    'genre_counts': GENRE_COUNTS_QUERY,
+    'decade_counts': 'SELECT * FROM summary_decade_counts WHERE project_id = :project_id ORDER BY decade',
+    'origin_counts': 'SELECT * FROM summary_origin_counts WHERE project_id = :project_id ORDER BY count DESC',
+    'album_highlights': 'SELECT * FROM summary_album_highlights WHERE project_id = :project_id ORDER BY kind, rank',
+    'rating_trend': RATING_TREND_QUERY
+}
+
+# Show a click-to-load placeholder instead of embedding every YouTube player up front
+LAZY_EMBEDS = True
+
+# Detail sections picked one at a time below the overview; only the selected one is rendered
+SECTIONS = ['Decades', 'Latest Reviews', 'Top Genres', 'Ratings vs Global', 'Rating Trend', 'Location']
+
+
+def get_connection():
+    """
+    Returns the process-wide pooled connection shared by every session.
+    """
+    return st.connection("postgresql", type="sql", pool_size=5, max_overflow=5, pool_pre_ping=True)
+
+
+def fetch_load_version(project_id):
+    """
+    Returns the version written by the ETL at the end of each load of the project, checked at most
+    every VERSION_CHECK_TTL seconds; 0 when the project has never been loaded. After a failure the database
+    is not tried again for VERSION_CHECK_TTL seconds, and 0 is returned meanwhile.
+    """
+    global _database_down_until
+
+    if time.monotonic() < _database_down_until:
+        return 0
+
+    try:
+        version = get_connection().query('SELECT version FROM load_version WHERE project_id = :project_id', params={'project_id': project_id}, ttl=VERSION_CHECK_TTL)
+        return int(version['version'].iloc[0]) if not version.empty else 0
+    except Exception as error:
+        print(error)
+        _database_down_until = time.monotonic() + VERSION_CHECK_TTL
+        return 0
+
+
+@st.cache_data(show_spinner=False, max_entries=CACHED_PROJECTS)
+def fetch_project_tables(project_id, version):
+    """
+    Reads the project's current album and summary tables as DataFrames; cached until the ETL bumps its load version.
+    """
+    params = {'project_id': project_id}
+    with get_connection().engine.connect() as connection:
+        df1 = pd.read_sql(text('SELECT * FROM current_album WHERE project_id = :project_id'), connection, params=params)
+        aggregates = {
+            name: pd.read_sql(text(query), connection, params=params).drop(columns='project_id', errors='ignore')
+            for name, query in SUMMARY_QUERIES.items()
+        }
+    return df1, aggregates
+
+
+def render_style():
+    """
+    Injects the custom CSS shared by the dashboards.
+    """
+    st.markdown("""
+        <style>
+            body {
+                background-color: #f4f4f4;
+            }
+            .main-title {
+                background-color: #636EFA;
+                padding: 20px;
+                border-radius: 8px;
+                color: white;
+                text-align: center;
+                font-size: 32px;
+                font-weight: bold;
+                margin-bottom: 20px;
+            }
+            footer {visibility: hidden;}
+        </style>
+    """, unsafe_allow_html=True)
+
+
+def render_cover(url, **kwargs):
+    """
+    Renders album cover art from the local cover cache, or a caption for albums without one.
+    """
+    cover = cover_image(url)
+    if cover is None:
+        st.caption("No cover art")
+    else:
+        st.image(cover, **kwargs)
+
+
+def render_player(playlist_id, lazy=LAZY_EMBEDS):
+    """
+    Renders the YouTube player of a playlist. In lazy mode the iframe, and every request it makes to YouTube,
+    only loads once the user asks for it.
+    """
+    # The recommended URL for embedding a playlist
+    embed_url = f"https://www.youtube.com/embed/videoseries?list={playlist_id}"
+    loaded_key = f'player-loaded-{playlist_id}'
+
+    if lazy and not st.session_state.get(loaded_key):
+        placeholder = st.empty()
+        with placeholder.container():
+            clicked = st.button("▶️ Load YouTube player", key=f'player-{playlist_id}')
+            if not clicked:
+                st.link_button("Open on YouTube", url="https://youtube.com/playlist?list=" + playlist_id)
+                return
+
+        # Swap the placeholder for the player, which stays loaded on later reruns
+        placeholder.empty()
+        st.session_state[loaded_key] = True
+
+    components.html(f'<iframe src="{embed_url}" width="80%" height="280" frameborder="0" allowfullscreen></iframe>', height=315)
+
+
+def render_figure(fig):
+    """
+    Draws a Plotly figure across the column, counting its payload when profiling.
+    """
+    profiling.record_figure(fig)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_kpis(title, kpis):
+    """
+    Renders the title and the KPI row.
+    """
+    average_rate = kpis['average_rating']
+    total_albums = int(kpis['total_albums'])
+    best_streak = kpis['best_streak']
+    worst_streak = kpis['worst_streak']
+
+    st.markdown(f'<div class="main-title">{title}</div>', unsafe_allow_html=True)
+    kpi1, kpi2, kpi3, kpi4 = st.columns(4)
+    kpi1.metric("🔁 Average Rating", f"{average_rate:.2} stars")
+    kpi2.metric("👥 Albums Listened", f"{total_albums:,}")
+    kpi3.metric("🌟 Best Streak", f"{best_streak:.2} stars")
+    kpi4.metric("⚠️ Worst Streak", f"{worst_streak:.2} stars")
+    st.markdown('---')
+
+
+def render_current_album(df1, album_highlights):
+    """
+    Renders the current album next to the top and lowest rated albums.
+    """
+    col1, col2, col3 = st.columns([1, 1, 2])
+    # Current Album
+    with col1:
+        st.subheader("🎶 Current Album")
+
+        # Display current album details in grid
+        render_cover(df1['images'].iloc[0])
+
+    with col2:
+        st.subheader("")
+        st.markdown(
+            f'''
+            <p style='font-size:40px; color: violet; margin-bottom: -5px; font-weight:bold;'>{df1['name'].iloc[0]}</p>
+            <p style='font-size:28px; color: white; margin-bottom: -2px;'>{df1['artist'].iloc[0]}</p>
+            <p style='font-size:24px; color: white; margin-bottom: -4px; font-weight:bold;'>{df1['releasedate'].iloc[0]}</p>
+            <p style='font-size:20px; color: white; '>{df1['genres'].iloc[0]}</p>
+            ''', unsafe_allow_html=True)
+        st.markdown('')
+        st.link_button(label="Youtube",  icon="▶️", type='primary', url="https://youtube.com/playlist?list=" + df1['youtubemusicid'].iloc[0])
+        st.link_button(label="Spotify", icon="🎧", type='secondary', url="https://open.spotify.com/album/" + df1['spotifyid'].iloc[0])
+
+    # Show Top Rated Albums and Lowest Rated Albums
+    with col3:
+        st.subheader("🌟 Top Rated Albums")
+        top_rated = get_highlights(album_highlights, 'top_rated')
+        st.table(top_rated[['name', 'artist', 'rating']].set_index('name'))
+
+        st.subheader("⚠️ Lowest Rated Albums")
+        lowest_rated = get_highlights(album_highlights, 'lowest_rated')
+        st.table(lowest_rated[['name', 'artist', 'rating']].set_index('name'))
+
+    st.markdown('---')
+
+
+def render_decades(decade_counts):
+    """
+    Renders the albums per decade chart.
+    """
+    st.subheader("📅 Albums over the Years")
+
+    # Counts per decade, sorted by decade
+    if not decade_counts.empty:
+        fig_decades, missing_image = cached_figure('decades', decade_figure, decade_counts)
+        if missing_image is not None:
+            st.warning(f"Decade image not found at '{missing_image}'. Displaying a standard bar chart for decades.")
+        render_figure(fig_decades)
+    else:
+        st.info("No decade data to display.")
+
+
+def render_reviews(album_highlights):
+    """
+    Renders the three latest reviews with their YouTube playlists.
+    """
+    st.subheader("📝 Latest Reviews")
+
+    # The last 3 albums, most recent first
+    latest_reviews_df = get_highlights(album_highlights, 'latest')
+    if latest_reviews_df.empty:
+        st.info("No reviews to display.")
+        return
+
+    for _, row in latest_reviews_df.iterrows():
+        col_img, col_info, col_video = st.columns([1, 2, 2])  # Add column for video
+
+        with col_img:
+            st.markdown('')
+            render_cover(row['images'])
+
+        with col_info:
+            st.markdown(
+                f"""
+                <p style='font-size:28px; color: #ba55d3; font-weight:bold; margin-bottom: -10px;'>{row['name']}</p>
+                <p style='font-size:20px; color: white; margin-bottom: -4px;'>{row['artist']}</p>
+                <p style='font-size:17px; color: white; margin-bottom: -4px;'>{row['releasedate']}</p>
+                """, unsafe_allow_html=True)
+            st.subheader(f"⭐ Rating: {row['rating']}")
+            review_text = row['review']
+            if pd.notna(review_text) and review_text:
+                # Format review to replace both newlines and slashes with HTML line breaks
+                formatted_review = str(review_text).replace('\n', '<br>').replace('/', '<br>')
+                st.markdown(f"<p style='font-size:18px; color: white;'>{formatted_review}</p>", unsafe_allow_html=True)
+
+        with col_video:
+            if 'youtubemusicid' in row and pd.notna(row['youtubemusicid']):
+                render_player(row['youtubemusicid'])
+
+        st.markdown("---")  # Separator for each review
+
+
+def render_genres(genre_counts):
+    """
+    Renders the top genres chart.
+    """
+    st.subheader("🎵 Top Genres")
+    fig2 = cached_figure('genres', genre_figure, genre_counts)
+    render_figure(fig2)
+
+
+def render_rating_grid(albums, color, sign=''):
+    """
+    Renders album covers in a row with their rating difference underneath.
+    """
+    cols = st.columns(len(albums)) if len(albums) else []
+
+    for col, (_, album) in zip(cols, albums.iterrows()):
+        with col:
+            render_cover(album['images'], use_container_width=True)
+            st.markdown(f"<p style='text-align:center; color: {color}; font-size: 18px; font-weight:bold;'>{sign}{album['rating_diff']:.2f}</p>", unsafe_allow_html=True)
+
+
+def render_rating_diff(album_highlights, ncols=3):
+    """
+    Renders the albums rated furthest above and below their global rating.
+    """
+    col17, col18 = st.columns(2, gap="large")
+    with col17:
+        st.markdown("<p style='font-weight:bold; text-align:center; font-size: 20px; color:#636EFA;'>📈 Highest Rated Album vs Global Rating", unsafe_allow_html=True)
+        # Get top ncols albums where my rating is highest compared to global
+        render_rating_grid(get_highlights(album_highlights, 'overrated').head(ncols), '#33ff33', sign='+')
+
+    with col18:
+        st.markdown("<p style='font-weight:bold; text-align:center; font-size: 20px; color:#ff4d4d;'> 📉 Lowest Rated Album vs Global Rating", unsafe_allow_html=True)
+        # Get top ncols albums where my rating is lowest compared to global
+        # Sorted descending to show the album with the most negative difference last.
+        render_rating_grid(get_highlights(album_highlights, 'underrated').head(ncols), '#ff4d4d')
+
+
+def render_trend(rating_trend, key):
+    """
+    Renders the rolling rating trend over the listening history, for the window picked by the user.
+    """
+    st.subheader("📈 Rating Trend")
+
+    if rating_trend.drop(columns='position').isna().all().all():
+        st.info("No rating trend yet: it is computed when the project is next loaded.")
+        return
+
+    window = st.radio("Window", WINDOWS, index=1, horizontal=True, key=f'{key}-window', format_func=lambda w: f"{w} albums")
+    fig_trend = cached_figure('trend', trend_figure, rating_trend, window)
+    render_figure(fig_trend)
+
+
+def render_location(origin_counts, total_albums):
+    """
+    Renders the albums by location pie chart.
+    """
+    st.subheader("📍 Albums by Location")
+
+    fig_location, missing_flags = cached_figure('origins', origin_figure, origin_counts, total_albums)
+
+    if fig_location is not None:
+        for flag_path in missing_flags:
+            st.warning(f"Flag image not found at '{flag_path}'. The pie chart will be displayed without images.")
+        render_figure(fig_location)
+    else:
+        st.info("No location data to display.")
+
+
+@st.fragment
+def render_sections(aggregates, key):
+    """
+    Renders the detail section picked by the user. Runs as a fragment, so switching sections
+    only reruns this function and only the selected section is ever built.
+    """
+    section = st.radio("Section", SECTIONS, horizontal=True, key=key, label_visibility='collapsed')
+
+    album_highlights = aggregates['album_highlights']
+
+    with profiling.section(section) as record:
+        if section == 'Decades':
+            render_decades(aggregates['decade_counts'])
+        elif section == 'Latest Reviews':
+            render_reviews(album_highlights)
+        elif section == 'Top Genres':
+            render_genres(aggregates['genre_counts'])
+        elif section == 'Ratings vs Global':
+            render_rating_diff(album_highlights)
+        elif section == 'Rating Trend':
+            render_trend(aggregates['rating_trend'], key)
+        elif section == 'Location':
+            render_location(aggregates['origin_counts'], int(aggregates['kpis']['total_albums'].iloc[0]))
+
+    # Switching sections reruns only this fragment, not the profile table at the bottom of the page
+    if record is not None:
+        st.caption(f"{section} rendered in {record['ms']:.1f} ms, {record['figure_bytes'] / 1024:.1f} KiB of figures.")
+
+
+def render_dashboard(title, df1, aggregates, key='section'):
+    """
+    Renders a whole dashboard from the current album and the aggregates of compute_aggregates:
+    the KPIs and current album up front, then one detail section at a time. With the profiling overlay
+    on, each part is timed, see profiling.section.
+    """
+    render_style()
+    with profiling.section('KPIs'):
+        render_kpis(title, aggregates['kpis'].iloc[0])
+    with profiling.section('Current Album'):
+        render_current_album(df1, aggregates['album_highlights'])
+    render_sections(aggregates, key)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from windows import window_columns
+
+# Free-text columns of the albums frame, held as Arrow-backed strings rather than Python objects
+STRING_COLUMNS = ['artist', 'name', 'images', 'allGenres', 'review', 'youtubeMusicId']
+
+# Low-cardinality columns of the albums frame, held as categoricals
+CATEGORY_COLUMNS = ['artistOrigin']
+
+# Numeric columns of the albums frame and their compact dtypes. Ratings stay float until the
+# unrated albums are dropped by transform.transform_music, which narrows them to int8.
+NUMERIC_DTYPES = {
+    'position': 'int32',
+    'releaseDate': 'Int16',
+    'rating': 'float32',
+    'globalRating': 'float32',
+    'streak': 'float32',
+    **{col: 'float32' for col in window_columns()}
+}
+
+# Dtype of the Arrow-backed string columns
+STRING_DTYPE = 'string[pyarrow]'
+
+
+def release_years(values):
+    """
+    Parses release dates, given as years or ISO dates, into nullable 16-bit years; unparseable dates become NA.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype('Int16')
+    years = values.astype('string').str.extract(r'^\s*(\d{4})', expand=False)
+    return pd.to_numeric(years, errors='coerce').astype('Int16')
+
+
+def compact_albums(df2):
+    """
+    Converts the columns of an albums frame to their compact dtypes, see STRING_COLUMNS, CATEGORY_COLUMNS
+    and NUMERIC_DTYPES. Missing columns are skipped, so the raw and the transformed frames both go through it.
+    """
+    dtypes = {}
+    for col in df2.columns:
+        if col in STRING_COLUMNS:
+            dtypes[col] = STRING_DTYPE
+        elif col in CATEGORY_COLUMNS:
+            dtypes[col] = 'category'
+        elif col in NUMERIC_DTYPES and col != 'releaseDate':
+            dtypes[col] = NUMERIC_DTYPES[col]
+
+    df2 = df2.astype(dtypes)
+    if 'releaseDate' in df2.columns:
+        df2['releaseDate'] = release_years(df2['releaseDate'])
+
+    return df2
+
+
+def memory_report(df):
+    """
+    Returns the deep memory usage of every column of a frame, largest first, with its dtype and bytes per row.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'column': usage.index,
+        'dtype': df.dtypes.astype(str).reindex(usage.index).to_numpy(),
+        'bytes': usage.to_numpy(),
+        'bytes_per_row': usage.to_numpy() / max(len(df), 1)
+    })
+    return report.sort_values('bytes', ascending=False, kind='stable', ignore_index=True)
+
+
+def frame_bytes(*frames):
+    """
+    Returns the total deep memory usage of the given frames, in bytes.
+    """
+    return int(np.sum([frame.memory_usage(deep=True).sum() for frame in frames]))
@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from contextlib import nullcontext
+import ijson
+import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dtypes import compact_albums
+from metrics import stage
+
+API_URL = "https://1001albumsgenerator.com/api/v1/projects/{}"
+
+# (connect, read) timeout in seconds
+TIMEOUT = (5, 30)
+
+# Concurrency of the batch extractor
+MAX_WORKERS = 16
+PER_HOST_LIMIT = 4
+
+# Retries with exponential backoff on connection errors, 429 and 5xx responses
+RETRIES = 3
+BACKOFF = 0.5
+
+# Raw project responses kept between runs, with their validators
+CACHE_DIR = Path('.cache/projects')
+
+# Bytes read per chunk when streaming a response to disk
+CHUNK_SIZE = 64 * 1024
+
+# Columns of the albums frame built from the listening history, besides 'position'
+HISTORY_COLUMNS = ['artist', 'name', 'artistOrigin', 'releaseDate', 'images', 'genres', 'subGenres', 'rating', 'globalRating', 'review', 'youtubeMusicId']
+
+_session = None
+_session_lock = threading.Lock()
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+
+def make_session(pool_size=MAX_WORKERS, retries=RETRIES, backoff=BACKOFF):
+    """
+    Creates a session that keeps connections alive and retries failed requests with backoff.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET']
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Returns the process-wide session, created on first use.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def fetch_project(project_id, session=None, base_url=None, timeout=TIMEOUT):
+    """
+    Downloads the raw project JSON from the API.
+    Raises requests.exceptions.RequestException on failure.
+    """
+    session = session or get_session()
+    url = (base_url or API_URL).format(project_id)
+
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()  # Raise an error for bad responses
+
+    return response.json()
+
+
+def cache_paths(project_id, cache_dir=CACHE_DIR):
+    """
+    Returns the (body, meta) file paths of a cached project response.
+    """
+    cache_dir = Path(cache_dir)
+    return cache_dir / f'{project_id}.json', cache_dir / f'{project_id}.meta.json'
+
+
+def read_cached_meta(project_id, cache_dir=CACHE_DIR):
+    """
+    Returns the validators stored with a cached project response, or {} when nothing usable is cached.
+    """
+    body_path, meta_path = cache_paths(project_id, cache_dir)
+
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+    return meta if body_path.exists() else {}
+
+
+def write_cached_meta(project_id, meta, cache_dir=CACHE_DIR):
+    """
+    Stores the validators of a cached project response, replacing the previous copy atomically.
+    """
+    _, meta_path = cache_paths(project_id, cache_dir)
+
+    tmp_path = meta_path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(meta))
+    os.replace(tmp_path, meta_path)
+
+
+def host_limit(url):
+    """
+    Returns the process-wide semaphore letting at most PER_HOST_LIMIT requests at a time reach the url's host.
+    """
+    host = urlsplit(url).netloc
+    with _host_limits_lock:
+        return _host_limits.setdefault(host, threading.BoundedSemaphore(PER_HOST_LIMIT))
+
+
+def fetch_project_cached(project_id, session=None, base_url=None, timeout=TIMEOUT, cache_dir=CACHE_DIR):
+    """
+    Downloads the raw project JSON with a conditional request against the on-disk cache,
+    streaming the body straight to disk.
+    Returns (path, changed): the cached body file, and False when the payload, whether a 304
+    or an identical body, is the one last recorded by mark_loaded. Concurrent calls share the per-host
+    limit of host_limit.
+    Raises requests.exceptions.RequestException on failure.
+    """
+    session = session or get_session()
+    url = (base_url or API_URL).format(project_id)
+
+    body_path, _ = cache_paths(project_id, cache_dir)
+    meta = read_cached_meta(project_id, cache_dir)
+
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('lastModified'):
+        headers['If-Modified-Since'] = meta['lastModified']
+
+    with host_limit(url), stage('fetch', project_id, bytes_downloaded=0) as record, session.get(url, timeout=timeout, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            logging.info(f"Project {project_id} not modified since the last request.")
+        else:
+            response.raise_for_status()  # Raise an error for bad responses
+
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = body_path.with_suffix('.tmp')
+            digest = hashlib.sha256()
+
+            with open(tmp_path, 'wb') as file:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    file.write(chunk)
+                    digest.update(chunk)
+                    record['bytes_downloaded'] += len(chunk)
+            os.replace(tmp_path, body_path)
+
+            meta = dict(
+                meta,
+                etag=response.headers.get('ETag'),
+                lastModified=response.headers.get('Last-Modified'),
+                sha256=digest.hexdigest()
+            )
+            write_cached_meta(project_id, meta, cache_dir)
+
+    changed = meta['sha256'] != meta.get('loadedSha256')
+    if not changed:
+        logging.info(f"Project {project_id} unchanged since the last load.")
+
+    return body_path, changed
+
+
+def mark_loaded(project_id, cache_dir=CACHE_DIR):
+    """
+    Records the cached payload of a project as loaded, so identical payloads are skipped next time.
+    """
+    meta = read_cached_meta(project_id, cache_dir)
+    if meta:
+        write_cached_meta(project_id, dict(meta, loadedSha256=meta.get('sha256')), cache_dir)
+
+
+def parse_current(current_album, updateFrequency=None):
+    """
+    Untangles the current album JSON into a one-row DataFrame.
+    """
+    artist = current_album['artist']
+    artistOrigin = current_album['artistOrigin']
+    imagesUrl = current_album['images'][0]['url']
+    genres = current_album['genres']
+    subGenres = current_album['subGenres']
+    name = current_album['name']
+    releaseDate = current_album['releaseDate']
+    youtubeMusicId = current_album['youtubeMusicId']
+    spotifyId = current_album['spotifyId']
+
+    current = pd.DataFrame({
+        'artist': artist,
+        'artistOrigin': artistOrigin,
+        'images': imagesUrl,
+        'genres': [genres],
+        'subGenres': [subGenres],
+        'name': name,
+        'releaseDate': releaseDate,
+        'youtubeMusicId': youtubeMusicId,
+        'spotifyId': spotifyId,
+        'updateFrequency': updateFrequency
+    }, index=[0])
+
+    logging.info(f"Extracted data for current album: {name} by {artist}")
+
+    return current
+
+
+def parse_project(data):
+    """
+    Untangles the project JSON into the current album and the listening history DataFrames,
+    the latter in the compact dtypes of dtypes.compact_albums.
+    """
+    # current album
+    current = parse_current(data['currentAlbum'], data.get('updateFrequency'))
+
+    # listening history
+    history = pd.DataFrame(data['history'])
+
+    # past albums
+
+    all_albums = history['album'].tolist()
+    past_albums = pd.DataFrame(all_albums)
+
+    albums_df = pd.DataFrame()
+
+    albums_df['position'] = history.index
+    albums_df['artist'] = past_albums['artist']
+    albums_df['name'] = past_albums['name']
+    albums_df['artistOrigin'] = past_albums['artistOrigin']
+    albums_df['releaseDate'] = past_albums['releaseDate']
+    albums_df['images'] = past_albums['images'].apply(lambda x: x[0]['url'] if isinstance(x, list) and len(x) > 0 else None)
+    albums_df['genres'] = past_albums['genres'].apply(lambda x: x if isinstance(x, list) else [])
+    albums_df['subGenres'] = past_albums['subGenres'].apply(lambda x: x if isinstance(x, list) else [])
+    albums_df['rating'] = history['rating']
+    albums_df['globalRating'] = history['globalRating']
+    albums_df['review'] = history['review']
+    albums_df['youtubeMusicId'] = past_albums['youtubeMusicId']
+
+    return current, compact_albums(albums_df)
+
+
+def parse_project_stream(source):
+    """
+    Parses a project JSON file (path or seekable binary file) without materialising the whole document:
+    history entries are streamed one at a time into column buffers that become the albums frame.
+    Returns the same (current, albums_df) as parse_project.
+    """
+    with open(source, 'rb') if isinstance(source, (str, os.PathLike)) else nullcontext(source) as file:
+        # The small top-level fields come before the history in the API response
+        current_album = next(ijson.items(file, 'currentAlbum', use_float=True))
+        file.seek(0)
+        updateFrequency = next(ijson.items(file, 'updateFrequency'), None)
+        file.seek(0)
+
+        current = parse_current(current_album, updateFrequency)
+
+        columns = {col: [] for col in HISTORY_COLUMNS}
+
+        for entry in ijson.items(file, 'history.item', use_float=True):
+            album = entry['album']
+            images = album.get('images')
+            genres = album.get('genres')
+            subGenres = album.get('subGenres')
+
+            columns['artist'].append(album.get('artist'))
+            columns['name'].append(album.get('name'))
+            columns['artistOrigin'].append(album.get('artistOrigin'))
+            columns['releaseDate'].append(album.get('releaseDate'))
+            columns['images'].append(images[0]['url'] if isinstance(images, list) and len(images) > 0 else None)
+            columns['genres'].append(genres if isinstance(genres, list) else [])
+            columns['subGenres'].append(subGenres if isinstance(subGenres, list) else [])
+            columns['rating'].append(entry.get('rating'))
+            columns['globalRating'].append(entry.get('globalRating'))
+            columns['review'].append(entry.get('review'))
+            columns['youtubeMusicId'].append(album.get('youtubeMusicId'))
+
+    albums_df = pd.DataFrame(columns)
+    albums_df.insert(0, 'position', range(len(albums_df)))
+
+    return current, compact_albums(albums_df)
+
+
+def fetch_projects(executor, project_ids, session=None, base_url=None, timeout=TIMEOUT, cache_dir=CACHE_DIR):
+    """
+    Submits fetch_project_cached of every project to the executor, the batch extractor's thread pool.
+    Returns a dict of future -> project id; each future's result is (path, changed, seconds).
+    """
+    def fetch_one(project_id):
+        start = time.perf_counter()
+        path, changed = fetch_project_cached(project_id, session=session, base_url=base_url, timeout=timeout, cache_dir=cache_dir)
+        return path, changed, time.perf_counter() - start
+
+    return {executor.submit(fetch_one, project_id): project_id for project_id in project_ids}
+
+
+def extract_projects(project_ids, base_url=None, max_workers=MAX_WORKERS, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF, cache_dir=CACHE_DIR):
+    """
+    Fetches many projects concurrently over one keep-alive session, through the on-disk cache,
+    and parses each one as soon as it is downloaded.
+    Returns a dict of project id -> (current, albums_df), or None for projects that failed.
+    """
+    session = make_session(pool_size=max_workers, retries=retries, backoff=backoff)
+
+    project_ids = list(dict.fromkeys(project_ids))
+    logging.info(f"Requesting API data for {len(project_ids)} projects...")
+
+    results = dict.fromkeys(project_ids)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = fetch_projects(executor, project_ids, session=session, base_url=base_url, timeout=timeout, cache_dir=cache_dir)
+            for future in as_completed(futures):
+                project_id = futures[future]
+                try:
+                    path, _, _ = future.result()
+                    results[project_id] = parse_project_stream(path)
+                except Exception as e:
+                    logging.error(f"Failed to extract project {project_id}: {e}")
+    finally:
+        session.close()
+
+    failed = sum(result is None for result in results.values())
+    logging.info(f"Extracted {len(results) - failed} projects, {failed} failed.")
+
+    return results
@@ -0,0 +1,158 @@
+import io
+import os
+import base64
+import hashlib
+import logging
+import time
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+from PIL import Image, features
+from extract import make_session
+
+# Encoded chart images kept between runs, one data URI per file
+IMAGE_CACHE_DIR = Path('.cache/images')
+
+# Album covers downloaded once and kept resized between runs
+COVER_CACHE_DIR = Path('.cache/covers')
+
+# Largest (width, height) in pixels each image is drawn at, about twice the on-screen size for high-DPI displays
+DECADE_SIZE = (256, 256)
+FLAG_SIZE = (192, 192)
+COVER_SIZE = (400, 400)
+
+# (connect, read) timeout of a cover download; covers are fetched while a page renders, so they are not retried
+COVER_TIMEOUT = (2, 5)
+
+# Seconds before a cover whose download failed is tried again; until then the remote url is used
+COVER_RETRY_AFTER = 300
+
+# WebP when Pillow was built with it, PNG otherwise
+IMAGE_FORMAT = 'WEBP' if features.check('webp') else 'PNG'
+IMAGE_QUALITY = 80
+
+
+def resize_image(source, size, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    """
+    Decodes an image (path or binary file), downsizes it to fit within size keeping its aspect ratio
+    and returns it encoded in image_format.
+    """
+    with Image.open(source) as image:
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=quality, optimize=True)
+
+    return buffer.getvalue()
+
+
+def encode_image(path, size, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    """
+    Decodes an image, downsizes it to fit within size keeping its aspect ratio and encodes it as a data URI.
+    """
+    encoded = base64.b64encode(resize_image(path, size, image_format, quality)).decode('ascii')
+    return f'data:image/{image_format.lower()};base64,{encoded}'
+
+
+@lru_cache(maxsize=64)
+def _cached_data_uri(path, mtime_ns, size, image_format, quality, cache_dir):
+    key = hashlib.sha256(repr((path, mtime_ns, size, image_format, quality)).encode()).hexdigest()
+    cache_path = Path(cache_dir) / f'{key}.txt'
+
+    try:
+        return cache_path.read_text()
+    except OSError:
+        pass
+
+    data_uri = encode_image(path, size, image_format, quality)
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix('.tmp')
+        tmp_path.write_text(data_uri)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Could not cache encoded image '{path}': {e}")
+
+    return data_uri
+
+
+def image_data_uri(path, size, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY, cache_dir=IMAGE_CACHE_DIR):
+    """
+    Returns the image at path downsized and encoded as a data URI, ready for a Plotly layout image.
+    Each image is only encoded once per file version: results are cached in process and on disk.
+    Raises FileNotFoundError when the image does not exist.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    return _cached_data_uri(str(path), mtime_ns, tuple(size), image_format, quality, str(cache_dir))
+
+
+_cover_session = None
+_cover_session_lock = threading.Lock()
+
+_failed_covers = {}
+_failed_covers_lock = threading.Lock()
+
+
+def get_cover_session():
+    """
+    Returns the keep-alive session cover art is downloaded with, created on first use.
+    """
+    global _cover_session
+    with _cover_session_lock:
+        if _cover_session is None:
+            _cover_session = make_session(retries=0)
+        return _cover_session
+
+
+@lru_cache(maxsize=1024)
+def _cached_cover(url, size, image_format, quality, cache_dir):
+    key = hashlib.sha256(repr((url, size, image_format, quality)).encode()).hexdigest()
+    cache_path = Path(cache_dir) / f'{key}.{image_format.lower()}'
+
+    if not cache_path.exists():
+        response = get_cover_session().get(url, timeout=COVER_TIMEOUT)
+        response.raise_for_status()  # Raise an error for bad responses
+
+        data = resize_image(io.BytesIO(response.content), size, image_format, quality)
+
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, cache_path)
+
+        logging.info(f"Cached cover '{url}' ({len(response.content)} -> {len(data)} bytes).")
+
+    return str(cache_path)
+
+
+def cover_image(url, size=COVER_SIZE, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY, cache_dir=COVER_CACHE_DIR):
+    """
+    Returns a local, resized copy of the cover art at url, downloading it on first use only.
+    Falls back to the url itself when the download fails, and returns None for albums without a cover.
+    """
+    if not isinstance(url, str) or not url:
+        return None
+
+    with _failed_covers_lock:
+        if time.monotonic() < _failed_covers.get(url, 0):
+            return url
+
+    try:
+        return _cached_cover(url, tuple(size), image_format, quality, str(cache_dir))
+    except Exception as e:
+        logging.warning(f"Could not cache cover '{url}': {e}")
+        with _failed_covers_lock:
+            _failed_covers[url] = time.monotonic() + COVER_RETRY_AFTER
+        return url
+
+
+def figure_payload_bytes(fig):
+    """
+    Returns the size of the figure JSON sent to the browser.
+    """
+    return len(fig.to_json().encode())
@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import datetime
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# JSON lines file the ETL appends one record per stage to, see stage
+METRICS_PATH = Path('.cache/metrics/etl.jsonl')
+
+# Numeric record fields summed across a run for the Prometheus export: field -> (metric, help)
+COUNTERS = {
+    'seconds': ('etl_stage_seconds_total', 'Wall time spent in the stage.'),
+    'rows_in': ('etl_stage_rows_in_total', 'Rows handed to the stage.'),
+    'rows_out': ('etl_stage_rows_out_total', 'Rows produced or written by the stage.'),
+    'bytes_downloaded': ('etl_stage_bytes_downloaded_total', 'Response bytes downloaded from the API.'),
+    'bytes_read': ('etl_stage_bytes_read_total', 'Payload bytes parsed.'),
+    'round_trips': ('etl_stage_db_round_trips_total', 'Statements and COPY commands sent to PostgreSQL.')
+}
+
+_run = {'run_id': None, 'started': None, 'jsonl_path': None, 'prometheus_path': None}
+_totals = {}
+_peak_rss = 0
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of the process so far in bytes, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def start_run(run_id=None, jsonl_path=None, prometheus_path=None):
+    """
+    Starts a run: every stage record carries its run id, is appended to jsonl_path when given, and is added
+    to the totals finish_run writes to prometheus_path. Worker processes pass their parent's run id and no paths.
+    Returns the run id.
+    """
+    with _lock:
+        _run.update(run_id=run_id or uuid.uuid4().hex[:12], started=time.perf_counter(), jsonl_path=jsonl_path, prometheus_path=prometheus_path)
+        _totals.clear()
+    return _run['run_id']
+
+
+def run_id():
+    """
+    Returns the id of the current run, starting one without any export on first use.
+    """
+    return _run['run_id'] or start_run()
+
+
+def emit(record):
+    """
+    Adds a stage record to the run totals, to the records being captured by this thread and to the JSON lines file.
+    """
+    global _peak_rss
+
+    for captured in getattr(_local, 'captures', []):
+        captured.append(record)
+
+    with _lock:
+        totals = _totals.setdefault((record['stage'], record['status']), {'count': 0})
+        totals['count'] += 1
+        for field in COUNTERS:
+            if record.get(field) is not None:
+                totals[field] = totals.get(field, 0) + record[field]
+        _peak_rss = max(_peak_rss, record.get('peak_rss_bytes') or 0)
+
+        if _run['jsonl_path'] is not None:
+            path = Path(_run['jsonl_path'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a') as file:
+                file.write(json.dumps(record, default=str) + '\n')
+
+    logging.debug(f"Stage record: {record}")
+
+
+@contextmanager
+def stage(name, project_id=None, **fields):
+    """
+    Times the enclosed block as one stage of the run. Yields the record, for the block to add its counters
+    (see COUNTERS) or set 'status'; an exception marks it 'error' and propagates. On exit the record gets
+    the wall time and the process' peak RSS so far and is emitted.
+    """
+    record = dict(run_id=run_id(), stage=name, project_id=project_id, **fields)
+    record['started_at'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    start = time.perf_counter()
+
+    try:
+        yield record
+    except Exception as e:
+        record.update(status='error', error=f'{type(e).__name__}: {e}')
+        raise
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['peak_rss_bytes'] = peak_rss()
+        record.setdefault('status', 'ok')
+        emit(record)
+
+
+@contextmanager
+def capture():
+    """
+    Collects the records emitted by this thread within the block into the yielded list, so a worker process
+    can hand its records back to the parent, which emits them into the run's exports.
+    """
+    captured = []
+    _local.captures = getattr(_local, 'captures', []) + [captured]
+    try:
+        yield captured
+    finally:
+        _local.captures = [c for c in _local.captures if c is not captured]
+
+
+def prometheus_text():
+    """
+    Renders the run totals in the Prometheus text exposition format, labelled by stage and status;
+    a stage only gets the counters its records report.
+    """
+    with _lock:
+        totals = {key: dict(value) for key, value in _totals.items()}
+        lines = [
+            '# HELP etl_run_info Id of the last ETL run.',
+            '# TYPE etl_run_info gauge',
+            f'etl_run_info{{run_id="{_run["run_id"]}"}} 1',
+            '# HELP etl_peak_rss_bytes Peak resident set size of the ETL process.',
+            '# TYPE etl_peak_rss_bytes gauge',
+            f'etl_peak_rss_bytes {_peak_rss}',
+            '# HELP etl_stage_runs_total Stages run.',
+            '# TYPE etl_stage_runs_total counter'
+        ]
+
+    lines += [f'etl_stage_runs_total{{stage="{name}",status="{status}"}} {value["count"]}' for (name, status), value in sorted(totals.items())]
+    for field, (metric, help_text) in COUNTERS.items():
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+        lines += [f'{metric}{{stage="{name}",status="{status}"}} {value[field]:g}' for (name, status), value in sorted(totals.items()) if field in value]
+
+    return '\n'.join(lines) + '\n'
+
+
+def finish_run(status='ok'):
+    """
+    Emits the record of the whole run and, when the run has a prometheus_path, writes the totals there
+    atomically so a node exporter textfile collector never reads a partial file.
+    """
+    record = dict(run_id=run_id(), stage='run', project_id=None, status=status, peak_rss_bytes=peak_rss())
+    record['seconds'] = time.perf_counter() - _run['started']
+    emit(record)
+
+    path = _run['prometheus_path']
+    if path is not None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        tmp_path.write_text(prometheus_text())
+        os.replace(tmp_path, path)
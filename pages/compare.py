@@ -0,0 +1,86 @@
+# Leaderboards and rating comparisons across every loaded project
+import streamlit as st
+import pandas as pd
+from sqlalchemy import text
+from compare import COMPARISON_QUERY, compute_comparison, genre_leaders, leaderboard, most_similar
+from dashboard import DEFAULT_PROJECT_ID, VERSION_CHECK_TTL, get_connection, render_style
+from user_album import project_id as to_project_id
+
+LEADERBOARD_LABELS = {
+    'albums_rated': 'Albums rated',
+    'average_rating': 'Average rating',
+    'generosity': 'Rating above global',
+    'mean_abs_diff': 'Distance from global',
+    'global_agreement': 'Agreement with global',
+    'average_similarity': 'Similarity to others'
+}
+
+
+def fetch_comparison_version():
+    """
+    Returns a version that changes whenever any project is loaded, checked at most every VERSION_CHECK_TTL seconds.
+    """
+    version = get_connection().query('SELECT COALESCE(SUM(version), 0) AS version FROM load_version', ttl=VERSION_CHECK_TTL)
+    return int(version['version'].iloc[0])
+
+
+# Shared rather than copied per session: the correlation matrix grows with the square of the projects
+@st.cache_resource(show_spinner="Comparing projects...", max_entries=1)
+def fetch_comparison(version):
+    """
+    Reads the rated albums of every project and compares them; cached until any project is loaded again.
+    """
+    with get_connection().engine.connect() as connection:
+        albums = pd.read_sql(text(COMPARISON_QUERY), connection)
+    return compute_comparison(albums), len(albums)
+
+
+render_style()
+st.markdown('<div class="main-title">Compare Projects</div>', unsafe_allow_html=True)
+
+try:
+    comparison, ratings = fetch_comparison(fetch_comparison_version())
+except Exception as error:
+    print(error)
+    st.error("Failed to load data from the database.")
+    st.stop()
+
+board = comparison['leaderboard']
+if len(board) < 2:
+    st.info("At least two loaded projects are needed to compare them.")
+    st.stop()
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Projects", f"{len(board):,}")
+col2.metric("Ratings", f"{ratings:,}")
+col3.metric("Average Rating", f"{board['average_rating'].mean():.1f} stars")
+
+# Leaderboard
+st.subheader("🏆 Leaderboard")
+col_column, col_order = st.columns([3, 1])
+column = col_column.selectbox("Rank by", list(LEADERBOARD_LABELS), format_func=LEADERBOARD_LABELS.get)
+ascending = col_order.toggle("Lowest first")
+st.dataframe(leaderboard(comparison, column, n=25, ascending=ascending), use_container_width=True)
+
+# One project against the others
+st.subheader("🎧 Your Project")
+project_id = to_project_id(st.text_input("Project", DEFAULT_PROJECT_ID))
+
+if project_id not in comparison['correlations'].index:
+    st.info(f"Project '{project_id}' has not been loaded yet.")
+else:
+    col_similar, col_genres = st.columns(2)
+    with col_similar:
+        st.caption("Most similar taste")
+        st.dataframe(most_similar(comparison, project_id), hide_index=True, use_container_width=True)
+    with col_genres:
+        st.caption("Average rating per genre, against every project")
+        genres = pd.DataFrame({
+            'project': comparison['genre_averages'].loc[project_id],
+            'everyone': comparison['genre_averages'].mean()
+        }).dropna().sort_values('project', ascending=False)
+        st.dataframe(genres, use_container_width=True)
+
+# Genre leaders
+st.subheader("🎵 Genre Leaders")
+st.dataframe(genre_leaders(comparison), hide_index=True, use_container_width=True)
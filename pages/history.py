@@ -0,0 +1,122 @@
+# Full listening history browser
+import streamlit as st
+import pandas as pd
+from sqlalchemy import text
+from browse import PAGE_SIZE, SORT_KEYS, history_count_query, history_page_query, next_cursor
+from dashboard import DEFAULT_PROJECT_ID, fetch_load_version, get_connection, render_style
+from user_album import project_id as to_project_id
+
+SORT_LABELS = {
+    'position': 'History position',
+    'artist': 'Artist',
+    'name': 'Album',
+    'artistorigin': 'Origin',
+    'releasedate': 'Release date',
+    'rating': 'Rating',
+    'globalrating': 'Global rating',
+    'streak': 'Streak'
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def fetch_filter_options(project_id, version):
+    """
+    Reads the genres, decades and origins of the project to filter by; cached per load version.
+    """
+    params = {'project_id': project_id}
+    with get_connection().engine.connect() as connection:
+        genres = pd.read_sql(text('SELECT DISTINCT g.genre FROM album_genres ag JOIN genres g USING (genre_id) WHERE ag.project_id = :project_id ORDER BY g.genre'), connection, params=params)['genre'].tolist()
+        decades = pd.read_sql(text('SELECT decade FROM summary_decade_counts WHERE project_id = :project_id ORDER BY decade'), connection, params=params)['decade'].tolist()
+        origins = pd.read_sql(text('SELECT artistorigin FROM summary_origin_counts WHERE project_id = :project_id ORDER BY artistorigin'), connection, params=params)['artistorigin'].tolist()
+    return genres, decades, origins
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def fetch_count(project_id, version, filters):
+    """
+    Counts the project's albums matching the filters; cached per load version.
+    """
+    query, params = history_count_query(project_id, **dict(filters))
+    with get_connection().engine.connect() as connection:
+        return int(pd.read_sql(query, connection, params=params)['count'].iloc[0])
+
+
+@st.cache_data(show_spinner=False, max_entries=1024)
+def fetch_page(project_id, version, filters, sort, descending, after, page_size):
+    """
+    Reads one page of the project's albums after the given cursor; cached per load version.
+    """
+    query, params = history_page_query(project_id, sort, descending, after, page_size, **dict(filters))
+    with get_connection().engine.connect() as connection:
+        # Nullable years, so a page with an unknown release date doesn't show the others as floats
+        return pd.read_sql(query, connection, params=params, dtype={'releasedate': 'Int16'})
+
+
+render_style()
+st.markdown('<div class="main-title">Listening History</div>', unsafe_allow_html=True)
+
+with st.sidebar:
+    project_id = to_project_id(st.text_input("Project", DEFAULT_PROJECT_ID))
+
+version = fetch_load_version(project_id)
+if not version:
+    st.info(f"Project '{project_id}' has not been loaded yet.")
+    st.stop()
+
+try:
+    genres, decades, origins = fetch_filter_options(project_id, version)
+except Exception as error:
+    print(error)
+    st.error("Failed to load data from the database.")
+    st.stop()
+
+# Filters and sorting
+with st.sidebar:
+    st.subheader("Filters")
+    genre = st.selectbox("Genre", [None] + genres, format_func=lambda g: 'All' if g is None else g)
+    decade = st.selectbox("Decade", [None] + decades, format_func=lambda d: 'All' if d is None else d)
+    origin = st.selectbox("Origin", [None] + origins, format_func=lambda o: 'All' if o is None else o)
+    rating = st.slider("Rating", 1, 5, (1, 5))
+
+    st.subheader("Sort")
+    sort = st.selectbox("Sort by", list(SORT_KEYS), format_func=SORT_LABELS.get)
+    descending = st.toggle("Descending")
+    page_size = st.selectbox("Albums per page", [25, PAGE_SIZE, 100, 250], index=1)
+
+filters = (
+    ('genre', genre),
+    ('decade', int(decade[:4]) if decade else None),
+    ('origin', origin),
+    ('rating', None if rating == (1, 5) else rating)
+)
+
+# Cursors of the pages visited so far; any change to the project, filters or sort starts over from the first page
+view = (project_id, filters, sort, descending, page_size)
+if st.session_state.get('history_view') != view:
+    st.session_state['history_view'] = view
+    st.session_state['history_cursors'] = [None]
+
+cursors = st.session_state['history_cursors']
+
+try:
+    total = fetch_count(project_id, version, filters)
+    page = fetch_page(project_id, version, filters, sort, descending, cursors[-1], page_size)
+except Exception as error:
+    print(error)
+    st.error("Failed to load data from the database.")
+    st.stop()
+
+first = (len(cursors) - 1) * page_size
+st.caption(f"{total:,} albums match; showing {first + 1 if len(page) else 0:,}–{first + len(page):,}.")
+
+st.dataframe(page.drop(columns='sort_key'), hide_index=True, use_container_width=True)
+
+col_prev, _, col_next = st.columns([1, 4, 1])
+with col_prev:
+    if st.button("⬅️ Previous", disabled=len(cursors) == 1, use_container_width=True):
+        cursors.pop()
+        st.rerun()
+with col_next:
+    if st.button("Next ➡️", disabled=first + len(page) >= total, use_container_width=True):
+        cursors.append(next_cursor(page))
+        st.rerun()
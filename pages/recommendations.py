@@ -0,0 +1,55 @@
+# Albums a project has not heard yet, ranked by predicted rating
+import os
+import streamlit as st
+import pandas as pd
+from sqlalchemy import text
+from dashboard import DEFAULT_PROJECT_ID, fetch_load_version, get_connection, render_style
+from recommend import INDEX_PATH, load_index, recommend
+from user_album import project_id as to_project_id
+
+# Recommendations listed per project
+RECOMMENDATIONS = 20
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def fetch_index(mtime_ns):
+    """
+    Reads the recommendation index written by album.py --recommend-index; cached until the file is rewritten.
+    """
+    return load_index(INDEX_PATH)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def fetch_ratings(project_id, version):
+    """
+    Reads the project's rated albums; cached per load version.
+    """
+    with get_connection().engine.connect() as connection:
+        return pd.read_sql(text('SELECT artist, name, rating FROM albums WHERE project_id = :project_id AND rating IS NOT NULL'), connection, params={'project_id': project_id})
+
+
+render_style()
+st.markdown('<div class="main-title">Recommendations</div>', unsafe_allow_html=True)
+
+try:
+    index = fetch_index(os.stat(INDEX_PATH).st_mtime_ns)
+except FileNotFoundError:
+    st.info("No recommendation index yet: run album.py with --recommend-index to build one.")
+    st.stop()
+
+project_id = to_project_id(st.text_input("Project", DEFAULT_PROJECT_ID))
+
+version = fetch_load_version(project_id)
+if not version:
+    st.info(f"Project '{project_id}' has not been loaded yet.")
+    st.stop()
+
+try:
+    ratings = fetch_ratings(project_id, version)
+except Exception as error:
+    print(error)
+    st.error("Failed to load data from the database.")
+    st.stop()
+
+st.caption(f"Predicted from {len(ratings):,} ratings and the {index['neighbours'].shape[1]} most similar albums of each of {len(index['names']):,} albums.")
+st.dataframe(recommend(index, ratings, RECOMMENDATIONS), hide_index=True, use_container_width=True)
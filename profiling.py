@@ -0,0 +1,135 @@
+import os
+import time
+import cProfile
+import datetime
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+import pandas as pd
+import streamlit as st
+from images import figure_payload_bytes
+
+# Query parameter and environment variable turning the overlay on: '1' times the sections,
+# 'cprofile' also dumps a cProfile of every full rerun
+PROFILE_PARAM = 'profile'
+PROFILE_ENV = 'DASHBOARD_PROFILE'
+
+# Where the cProfile dumps are written, one per rerun; read them with pstats or snakeviz
+PROFILE_DIR = Path('.cache/profiles')
+
+# Session state keys of the current rerun's timings and profiler
+TIMINGS_KEY = '_profile_timings'
+PROFILER_KEY = '_profile_profiler'
+
+_local = threading.local()
+
+
+def profile_mode():
+    """
+    Returns 'cprofile', 'timings' or None, from the page's query parameter or else the environment.
+    """
+    value = st.query_params.get(PROFILE_PARAM) or os.environ.get(PROFILE_ENV) or ''
+    value = value.strip().lower()
+    if value == 'cprofile':
+        return 'cprofile'
+    if value in ('1', 'true', 'yes', 'on', 'timings'):
+        return 'timings'
+    return None
+
+
+def enabled():
+    """
+    Returns whether the profiling overlay is on for this session.
+    """
+    return profile_mode() is not None
+
+
+def start_page():
+    """
+    Starts profiling a full rerun of the page: clears the last rerun's timings and, in 'cprofile' mode,
+    starts a profiler of the script thread. Call it at the top of the page, before anything is loaded.
+    """
+    # A rerun cut short by st.stop never reached render_profile to stop its profiler
+    leftover = st.session_state.pop(PROFILER_KEY, None)
+    if leftover is not None:
+        leftover.disable()
+
+    mode = profile_mode()
+    if mode is None:
+        return
+
+    st.session_state[TIMINGS_KEY] = {}
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        st.session_state[PROFILER_KEY] = profiler
+
+
+@contextmanager
+def section(name):
+    """
+    Times the enclosed block as one section of the dashboard, with the payload of the figures it
+    draws (see record_figure). Yields the section's record, or None when profiling is off.
+    """
+    if not enabled():
+        yield None
+        return
+
+    record = {'section': name, 'ms': 0.0, 'figure_bytes': 0}
+    _local.records = getattr(_local, 'records', []) + [record]
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['ms'] = (time.perf_counter() - start) * 1000
+        _local.records = [r for r in _local.records if r is not record]
+        st.session_state.setdefault(TIMINGS_KEY, {})[name] = record
+
+
+def record_figure(fig):
+    """
+    Adds the size of the figure JSON sent to the browser to the innermost open section.
+    """
+    records = getattr(_local, 'records', [])
+    if records:
+        records[-1]['figure_bytes'] += figure_payload_bytes(fig)
+
+
+def stop_profiler(page):
+    """
+    Stops the rerun's profiler, if any, and dumps its stats. Returns the dump's path or None.
+    """
+    profiler = st.session_state.pop(PROFILER_KEY, None)
+    if profiler is None:
+        return None
+
+    profiler.disable()
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{page}-{datetime.datetime.now():%Y%m%dT%H%M%S%f}.prof"
+    profiler.dump_stats(path)
+    return path
+
+
+def render_profile(page):
+    """
+    Renders the timings of the last full rerun at the bottom of the page, with the figure payload
+    of each section, and the path of the rerun's cProfile dump in 'cprofile' mode.
+    """
+    if not enabled():
+        return
+
+    path = stop_profiler(page)
+    timings = st.session_state.get(TIMINGS_KEY, {})
+
+    st.markdown('---')
+    st.subheader("⏱️ Render Profile")
+    if timings:
+        table = pd.DataFrame(list(timings.values())).set_index('section')
+        table.loc['Total'] = table.sum()
+        table['figure KiB'] = table.pop('figure_bytes') / 1024
+        st.dataframe(table.style.format({'ms': '{:.1f}', 'figure KiB': '{:.1f}'}), use_container_width=True)
+    else:
+        st.info("No section was timed on this rerun.")
+
+    if path is not None:
+        st.caption(f"cProfile of this rerun written to {path}.")
@@ -0,0 +1,268 @@
+import os
+import logging
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from aggregates import get_decade
+from compare import album_codes, rating_matrix
+
+# Rated albums of every loaded project, the training data of the recommender
+RECOMMEND_QUERY = '''
+    SELECT project_id, artist, name, allGenres, artistOrigin, releaseDate, rating, globalRating
+    FROM albums
+    WHERE rating IS NOT NULL
+'''
+
+# Item-item similarity index written by album.py --recommend-index and read by the recommendations page
+INDEX_PATH = Path('.cache/recommend/index.npz')
+
+# Most similar albums kept per album in the index
+NEIGHBOURS = 50
+
+# Relative weight of each block of album features in the content similarity
+FEATURE_WEIGHTS = {'genre': 1.0, 'origin': 0.3, 'decade': 0.3}
+
+# Share of the similarity taken from how projects co-rated the albums rather than from their features
+COLLABORATIVE_WEIGHT = 0.5
+
+# Shrinks collaborative similarities backed by few projects: a pair rated by n projects is scaled by n / (n + shrinkage)
+SIMILARITY_SHRINKAGE = 20
+
+# Added to the sum of neighbour weights, pulling predictions backed by few rated neighbours towards the baseline
+PREDICTION_SHRINKAGE = 1.0
+
+
+def normalize_rows(matrix):
+    """
+    Scales every row to unit length, leaving empty rows at zero.
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def one_hot(codes, n_albums, album_rows):
+    """
+    Builds an album x category indicator matrix from the category code of some albums, -1 for none.
+    """
+    matrix = np.zeros((n_albums, codes.max(initial=-1) + 1), dtype=np.float32)
+    known = codes >= 0
+    matrix[album_rows[known], codes[known]] = 1
+    return matrix
+
+
+def album_features(albums, codes, n_albums, weights=FEATURE_WEIGHTS):
+    """
+    Describes every album by the TF-IDF of its genres, its artist origin and its release decade.
+    Each block is normalized and weighted, so the dot product of two rows is a weighted cosine similarity.
+    """
+    _, first_rows = np.unique(codes, return_index=True)
+    catalogue = albums.iloc[first_rows]
+    album_rows = codes[first_rows]
+
+    genres = catalogue['allgenres'].fillna('').str.split(', ').set_axis(album_rows).explode()
+    genres = genres[genres.ne('')]
+    genre_codes, _ = pd.factorize(genres)
+    tf = one_hot(genre_codes, n_albums, genres.index.to_numpy(dtype=np.int64))
+
+    # Smoothed inverse document frequency: genres shared by many albums say little about any of them
+    idf = np.log((1 + n_albums) / (1 + tf.sum(axis=0))) + 1
+
+    origin_codes, _ = pd.factorize(catalogue['artistorigin'])
+    decade_codes, _ = pd.factorize(get_decade(catalogue['releasedate']).reindex(catalogue.index))
+
+    blocks = {
+        'genre': tf * idf,
+        'origin': one_hot(origin_codes, n_albums, album_rows),
+        'decade': one_hot(decade_codes, n_albums, album_rows)
+    }
+
+    features = np.hstack([np.sqrt(weights[name]) * normalize_rows(block) for name, block in blocks.items()])
+    return normalize_rows(features.astype(np.float32))
+
+
+def collaborative_similarity(ratings, shrinkage=SIMILARITY_SHRINKAGE):
+    """
+    Computes the adjusted cosine similarity of every pair of albums over the projects that rated both,
+    each rating centred on its project's mean, shrunk towards zero for pairs rated by few projects.
+    """
+    rated = ~np.isnan(ratings)
+    mask = rated.astype(np.float32)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.where(rated, ratings, 0).sum(axis=1) / rated.sum(axis=1)
+    centred = np.where(rated, ratings - means[:, None], 0).astype(np.float32)
+
+    products = centred.T @ centred
+    squares = (centred * centred).T @ mask
+    common = mask.T @ mask
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        similarity = products / np.sqrt(squares * squares.T) * common / (common + shrinkage)
+
+    return np.nan_to_num(similarity, nan=0, posinf=0, neginf=0)
+
+
+def build_index(albums, neighbours=NEIGHBOURS, collaborative_weight=COLLABORATIVE_WEIGHT):
+    """
+    Builds the item-item similarity index from the rated albums of every project (see RECOMMEND_QUERY):
+    the catalogue of albums, their global ratings, and the ids and similarities of each album's nearest neighbours.
+    """
+    albums = albums.rename(columns=str.lower)
+
+    codes, album_index = album_codes(albums)
+    _, ratings, global_ratings = rating_matrix(albums, codes, len(album_index))
+
+    features = album_features(albums, codes, len(album_index))
+    similarity = (1 - collaborative_weight) * (features @ features.T)
+    if collaborative_weight:
+        similarity += collaborative_weight * collaborative_similarity(ratings)
+    np.fill_diagonal(similarity, -np.inf)
+
+    # Partial sort of every row, then order the kept neighbours by similarity
+    neighbours = min(neighbours, len(album_index) - 1)
+    nearest = np.argpartition(-similarity, neighbours, axis=1)[:, :neighbours]
+    nearest_similarity = np.take_along_axis(similarity, nearest, axis=1)
+    order = np.argsort(-nearest_similarity, axis=1, kind='stable')
+
+    return {
+        'artists': album_index.get_level_values('artist').to_numpy(dtype=str),
+        'names': album_index.get_level_values('name').to_numpy(dtype=str),
+        'global_ratings': np.nan_to_num(global_ratings, nan=np.nanmean(global_ratings)),
+        'neighbours': np.take_along_axis(nearest, order, axis=1).astype(np.int32),
+        'similarities': np.take_along_axis(nearest_similarity, order, axis=1).astype(np.float32)
+    }
+
+
+def save_index(index, path=INDEX_PATH):
+    """
+    Writes the index as an uncompressed .npz file, replacing the previous one atomically.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as file:
+        np.savez(file, **index)
+    os.replace(tmp_path, path)
+
+    logging.info(f"Wrote recommendation index of {len(index['names'])} albums to {path}.")
+
+
+def load_index(path=INDEX_PATH):
+    """
+    Reads an index written by save_index.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+
+def index_codes(index, artists, names):
+    """
+    Returns the position in the index of each (artist, name), -1 for albums the index does not know.
+    """
+    # Joined keys hash much faster than a MultiIndex of the two columns
+    catalogue = pd.Index(np.char.add(np.char.add(index['artists'], '\x1f'), index['names']))
+    keys = pd.Series(artists, dtype=object).fillna('').str.cat(pd.Series(names, dtype=object).fillna(''), sep='\x1f')
+    return catalogue.get_indexer(keys)
+
+
+def predict_ratings(index, codes, ratings):
+    """
+    Predicts a project's rating of every album in the index from its ratings of the albums at codes.
+    The baseline is the project's mean shifted by how the album's global rating compares with those it rated;
+    the rated neighbours of each album then correct it by their weighted residuals from that baseline.
+    """
+    global_ratings = index['global_ratings']
+    ratings = np.asarray(ratings, dtype=np.float32)
+
+    baseline = ratings.mean() + global_ratings - global_ratings[codes].mean()
+
+    residuals = np.zeros(len(global_ratings), dtype=np.float32)
+    residuals[codes] = ratings - baseline[codes]
+    rated = np.zeros(len(global_ratings), dtype=bool)
+    rated[codes] = True
+
+    neighbours = index['neighbours']
+    weights = np.maximum(index['similarities'], 0) * rated[neighbours]
+    correction = (weights * residuals[neighbours]).sum(axis=1) / (weights.sum(axis=1) + PREDICTION_SHRINKAGE)
+
+    return np.clip(baseline + correction, 1, 5)
+
+
+def recommend(index, rated, n=10):
+    """
+    Returns the n albums the project has not rated with the highest predicted rating.
+    rated holds the project's albums with their 'artist', 'name' and 'rating'.
+    """
+    rated = rated.rename(columns=str.lower)
+    rated = rated[rated['rating'].notna()]
+    codes = index_codes(index, rated['artist'], rated['name'])
+    known = codes >= 0
+
+    if not known.any():
+        predictions = index['global_ratings'].astype(np.float32)
+    else:
+        predictions = predict_ratings(index, codes[known], rated['rating'].to_numpy()[known])
+
+    candidates = np.setdiff1d(np.arange(len(predictions)), codes[known])
+    n = min(n, len(candidates))
+    top = candidates[np.argpartition(-predictions[candidates], n - 1)[:n]] if n else candidates
+    top = top[np.argsort(-predictions[top], kind='stable')]
+
+    return pd.DataFrame({
+        'artist': index['artists'][top],
+        'name': index['names'][top],
+        'predicted_rating': predictions[top].round(2),
+        'global_rating': index['global_ratings'][top].round(2)
+    })
+
+
+def evaluate(albums, holdout=0.2, seed=0, neighbours=NEIGHBOURS):
+    """
+    Holds out a share of every project's ratings, builds the index from the rest and predicts the held-out ones.
+    Returns the RMSE of each model against the held-out ratings: the project's mean, the global-rating
+    baseline, content similarity alone and content blended with collaborative similarity.
+    """
+    albums = albums.rename(columns=str.lower)
+    test = np.random.default_rng(seed).random(len(albums)) < holdout
+    train = albums[~test]
+
+    indexes = {
+        'content': build_index(train, neighbours, collaborative_weight=0),
+        'content + collaborative': build_index(train, neighbours)
+    }
+    index = indexes['content']
+
+    train_codes = index_codes(index, train['artist'], train['name'])
+    test_codes = index_codes(index, albums.loc[test, 'artist'], albums.loc[test, 'name'])
+    test_frame = albums[test].assign(code=test_codes)
+    test_frame = test_frame[test_frame['code'] >= 0]
+    train_frame = train.assign(code=train_codes)
+
+    predictions = {name: [] for name in ['project mean', 'global baseline'] + list(indexes)}
+    actual = []
+
+    train_groups = dict(tuple(train_frame.groupby('project_id', sort=False)))
+
+    for project_id, held_out in test_frame.groupby('project_id', sort=False):
+        known = train_groups.get(project_id)
+        if known is None:
+            continue
+
+        codes = known['code'].to_numpy()
+        ratings = known['rating'].to_numpy(dtype=np.float32)
+        targets = held_out['code'].to_numpy()
+
+        actual.append(held_out['rating'].to_numpy(dtype=np.float32))
+        predictions['project mean'].append(np.full(len(targets), ratings.mean()))
+        predictions['global baseline'].append(np.clip(ratings.mean() + index['global_ratings'][targets] - index['global_ratings'][codes].mean(), 1, 5))
+        for name, model in indexes.items():
+            predictions[name].append(predict_ratings(model, codes, ratings)[targets])
+
+    actual = np.concatenate(actual)
+    return pd.DataFrame({
+        'model': list(predictions),
+        'rmse': [np.sqrt(np.mean((np.concatenate(predicted) - actual) ** 2)) for predicted in predictions.values()],
+        'ratings': len(actual)
+    })
@@ -0,0 +1,62 @@
+import os
+import logging
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Parquet compression codec of the snapshot files
+COMPRESSION = 'zstd'
+
+# File holding the name of the most recent complete snapshot
+LATEST = 'LATEST'
+
+
+def write_snapshot(snapshot_dir, version, df1, df2):
+    """
+    Writes the transformed current album and albums frames as a versioned Parquet snapshot.
+    The LATEST pointer is only moved once both files are complete.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    name = f'v{version:08d}'
+    path = snapshot_dir / name
+    path.mkdir(parents=True, exist_ok=True)
+
+    for table, frame in [('current_album', df1), ('albums', df2)]:
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path / f'{table}.parquet', compression=COMPRESSION)
+
+    tmp_path = snapshot_dir / f'{LATEST}.tmp'
+    tmp_path.write_text(name)
+    os.replace(tmp_path, snapshot_dir / LATEST)
+
+    logging.info(f"Wrote snapshot {name} with {len(df2)} albums to {snapshot_dir}.")
+
+    return name
+
+
+def latest_snapshot(snapshot_dir):
+    """
+    Returns the name of the most recent complete snapshot, or None when there is none.
+    """
+    try:
+        return (Path(snapshot_dir) / LATEST).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def read_snapshot(snapshot_dir, name, columns=None):
+    """
+    Reads a snapshot through memory-mapped Parquet files, loading only the given albums columns.
+    Returns (df1, df2).
+    """
+    path = Path(snapshot_dir) / name
+
+    df1 = pq.read_table(path / 'current_album.parquet', memory_map=True).to_pandas()
+
+    if columns is not None:
+        # Project onto the columns present in this snapshot, so older snapshots still load
+        available = pq.read_schema(path / 'albums.parquet', memory_map=True).names
+        columns = [col for col in columns if col in available]
+
+    df2 = pq.read_table(path / 'albums.parquet', columns=columns, memory_map=True).to_pandas()
+
+    return df1, df2
@@ -0,0 +1,7 @@
+# The modules live at the top of the repository, and the synthetic data and reference implementations in benchmarks
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
@@ -0,0 +1,55 @@
+# Equivalence of the vectorized transform_music with the original row-wise implementation
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_transform import legacy_transform_music
+from dtypes import compact_albums
+from extract import parse_project
+from synthetic import make_payload
+from transform import merge_genres, transform_music
+from windows import STREAK_WINDOW, rolling_mean
+
+
+@pytest.fixture
+def project():
+    """
+    A small synthetic project with missing covers, ratings and global ratings, null and empty genre lists,
+    and a genre name holding a comma.
+    """
+    logging.disable(logging.INFO)
+    payload = make_payload(200, seed=1, missing_images=0.3, missing_global_ratings=0.1)
+    history = payload['history']
+    history[0]['album']['genres'] = None
+    history[1]['album']['subGenres'] = None
+    history[2]['album'].update(genres=[''], subGenres=[])
+    history[3]['album'].update(genres=['Rock, Pop', 'Rock'], subGenres=[''])
+    history[4]['album'].update(genres=None, subGenres=None, images=None)
+    yield parse_project(payload)
+    logging.disable(logging.NOTSET)
+
+
+def test_merge_genres_matches_legacy(project):
+    _, df2 = project
+    _, legacy = legacy_transform_music(*[frame.copy() for frame in project])
+
+    merged = merge_genres(df2).loc[legacy.index]
+    assert merged.tolist() == legacy['allGenres'].tolist()
+
+
+def test_transform_music_matches_legacy(project):
+    df1, df2 = project
+    old1, old2 = legacy_transform_music(df1.copy(), df2.copy())
+    new1, new2 = transform_music(df1.copy(), df2.copy())
+
+    pd.testing.assert_frame_equal(old1, new1)
+    # The windowed statistics columns are new, every other column must match once in the compact dtypes
+    pd.testing.assert_frame_equal(compact_albums(old2).astype({'rating': 'int8'}), new2[old2.columns])
+
+
+def test_rolling_mean_matches_pandas():
+    values = pd.Series([3.0, np.nan, 2.5, 4.0, 3.5, 3.0, 2.0, np.nan, 4.5, 4.0, 3.0, 2.5, 3.5])
+    expected = values.rolling(STREAK_WINDOW).mean().to_numpy()
+    np.testing.assert_allclose(rolling_mean(values, STREAK_WINDOW), expected, equal_nan=True)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import logging
+from windows import STREAK_WINDOW, rolling_mean, window_stats
+from dtypes import compact_albums
+
+
+def join_lists(series):
+    """
+    Joins list cells into comma-separated strings, leaving other values untouched.
+    """
+    is_list = series.map(type).eq(list)
+    return series.where(~is_list, series.str.join(', '))
+
+
+def merge_genres(df2):
+    """
+    Merges the 'genres' and 'subGenres' list columns into one sorted, de-duplicated
+    comma-separated string per album, without any row-wise apply.
+    """
+    parts = []
+    for col in ['genres', 'subGenres']:
+        exploded = df2[col].reset_index(drop=True).explode()
+        sizes = np.bincount(exploded.index)[exploded.index]
+
+        # An empty list, or a list holding a single empty string, contributes no genre
+        keep = exploded.notna() & ~(exploded.eq('') & (sizes == 1))
+        parts.append(exploded[keep])
+
+    elements = pd.concat(parts)
+    merged = np.full(len(df2), '', dtype=object)
+
+    if not elements.empty:
+        # Tokenise each distinct genre string once; names holding commas split like the joined string would
+        element_codes, element_names = pd.factorize(elements.to_numpy())
+        tokens = pd.Series(element_names).str.split(',').explode().str.strip()
+
+        # Sorted vocabulary, so token codes order the same way as the genre names
+        token_codes, vocabulary = pd.factorize(tokens.to_numpy(), sort=True)
+        lookup = pd.DataFrame({'element': tokens.index, 'token': token_codes})
+
+        pairs = pd.DataFrame({'row': elements.index, 'element': element_codes}).merge(lookup, on='element')
+
+        # One sorted key per (album, genre) pair drops duplicates and orders genres within each album
+        keys = np.sort(pairs['row'].to_numpy(dtype=np.int64) * len(vocabulary) + pairs['token'].to_numpy())
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+        rows, codes = np.divmod(keys, len(vocabulary))
+
+        # Concatenate each album's genres, the first one without a leading separator
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        names = np.asarray(vocabulary, dtype=object)[codes]
+        pieces = ', ' + names
+        pieces[starts] = names[starts]
+
+        merged[rows[starts]] = np.add.reduceat(pieces, starts)
+
+    return pd.Series(merged, index=df2.index)
+
+
+def transform_music(df1, df2):
+    """
+    Applies transformations to the data pulled from XComs.
+    """
+    logging.info("Transforming data...")
+    logging.info(f"Applying transformations to {len(df2) + len(df1)} rows...")
+
+    # Convert list columns to comma-separated strings
+    for col in ['genres', 'subGenres']:
+        df1[col] = join_lists(df1[col])
+
+    # Merge genres and subGenres into a single de-duplicated column
+    df2['allGenres'] = merge_genres(df2)
+
+    # Drop the original genres and subGenres columns
+    df2 = df2.drop(columns=['genres', 'subGenres'])
+
+    # Rolling means, standard deviations and weighted means of the ratings, see windows.WINDOWS. Always over the
+    # whole history: the albums table drops unrated albums, whose globalRatings the global windows need, so the
+    # stored rows cannot seed window_stats' previous, and a full pass takes a few milliseconds per project anyway
+    df2 = df2.join(window_stats(df2))
+
+    # 5 albums global rating streak; unlike globalRatingMean5, an album without a global rating blanks the streaks
+    # of the windows holding it, as the original rolling mean did
+    df2['streak'] = rolling_mean(df2['globalRating'], STREAK_WINDOW)
+
+    # Remove Nan Values on Rating
+    df2 = df2.dropna(subset=['rating'])
+
+    # Compact dtypes for the merged genres and the statistics; ratings are 1 to 5 once the unrated albums are gone
+    df2 = compact_albums(df2)
+    df2['rating'] = df2['rating'].astype('int8')
+
+    logging.info("Data transformed successfully.")
+
+    return df1, df2
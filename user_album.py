@@ -1,11 +1,11 @@
-import pandas as pd
 import logging
 import requests
 import datetime
-
-file = open("log.txt", "a")
-file.write(f"User Task executed at {datetime.datetime.now()}\n")
-file.close()
+import threading
+from collections import OrderedDict
+from extract import fetch_project, parse_project
+from transform import transform_music
+from dtypes import frame_bytes
 
 # Logging configuration
 logging.basicConfig(
@@ -13,6 +13,22 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# How long a project's results stay cached, by the project's updateFrequency
+CACHE_TTL = {
+    'dailyWithWeekends': datetime.timedelta(days=1),
+    'dailyWithoutWeekends': datetime.timedelta(days=1),
+    'weekly': datetime.timedelta(days=7)
+}
+DEFAULT_CACHE_TTL = datetime.timedelta(days=1)
+
+# Maximum number of projects kept in memory
+CACHE_MAX_PROJECTS = 128
+
+# Shared by every Streamlit session of the process: project id -> (expiry, df1, df2, bytes)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
 
 def extract_music(PROJECT_ID):
     """
@@ -22,103 +38,23 @@ def extract_music(PROJECT_ID):
     logging.info("Requesting API data...")
 
     try:
-        response = requests.get("https://1001albumsgenerator.com/api/v1/projects/{}".format(PROJECT_ID))
-        response.raise_for_status()  # Raise an error for bad responses
+        data = fetch_project(PROJECT_ID)
     except requests.exceptions.RequestException as e:
         logging.error(f"Failed to fetch data from URL: {e}")
         return
 
-    data = response.json()
-
-    # current album
-    current_album = data['currentAlbum']
-
-    artist = current_album['artist']
-    artistOrigin = current_album['artistOrigin']
-    imagesUrl = current_album['images'][0]['url']
-    genres = current_album['genres']
-    subGenres = current_album['subGenres']
-    name = current_album['name']
-    releaseDate = current_album['releaseDate']
-    youtubeMusicId = current_album['youtubeMusicId']
-    spotifyId = current_album['spotifyId']
-
-    current = pd.DataFrame({
-        'artist': artist,
-        'artistOrigin': artistOrigin,
-        'images': imagesUrl,
-        'genres': [genres],
-        'subGenres': [subGenres],
-        'name': name,
-        'releaseDate': releaseDate,
-        'youtubeMusicId': youtubeMusicId,
-        'spotifyId': spotifyId
-    }, index=[0])
-
-    logging.info(f"Extracted data for current album: {name} by {artist}")
-
-    # listening history
-    history = pd.DataFrame(data['history'])
-
-    # past albums
-
-    all_albums = history['album'].tolist()
-    past_albums = pd.DataFrame(all_albums)
-
-    albums_df = pd.DataFrame()
-
-    albums_df['artist'] = past_albums['artist']
-    albums_df['name'] = past_albums['name']
-    albums_df['artistOrigin'] = past_albums['artistOrigin']
-    albums_df['releaseDate'] = past_albums['releaseDate']
-    albums_df['images'] = past_albums['images'].apply(lambda x: x[0]['url'] if isinstance(x, list) and len(x) > 0 else None)
-    albums_df['genres'] = past_albums['genres'].apply(lambda x: x if isinstance(x, list) else [])
-    albums_df['subGenres'] = past_albums['subGenres'].apply(lambda x: x if isinstance(x, list) else [])
-    albums_df['rating'] = history['rating']
-    albums_df['globalRating'] = history['globalRating']
-    albums_df['review'] = history['review']
-    albums_df['youtubeMusicId'] = past_albums['youtubeMusicId']
+    current, albums_df = parse_project(data)
 
     logging.info("Data extracted and saved to JSON files successfully.")
 
     return current, albums_df
 
 
-def transform_music(current, albums_df):
+def project_id(project_name):
     """
-    Applies transformations to the data pulled from XComs.
+    Converts a project name typed by the user into its 1001albumsgenerator id.
     """
-    logging.info("Transforming data...")
-    df1 = current
-    df2 = albums_df
-    logging.info(f"Applying transformations to {len(df2) + len(df1)} rows...")
-
-    # Convert list columns to comma-separated strings
-    for col in ['genres', 'subGenres']:
-        df1[col] = df1[col].apply(lambda x: ', '.join(x) if isinstance(x, list) else x)
-
-    for col in ['genres', 'subGenres']:
-        df2[col] = df2[col].apply(lambda x: ', '.join(x) if isinstance(x, list) else x)
-
-    # Merge genres and subGenres into a single column
-    df2['allGenres'] = df2.apply(lambda row: ', '.join(filter(None, [row['genres'], row['subGenres']])), axis=1)
-
-    # Remove genre duplicates
-    df2['allGenres'] = df2['allGenres'].apply(lambda x: ', '.join(sorted(set(map(str.strip, x.split(','))))))
-
-    # Drop the original genres and subGenres columns
-    df2 = df2.drop(columns=['genres', 'subGenres'])
-
-    # Create 5 albums global rating streak
-    df2['streak'] = df2['globalRating'].rolling(window=5).mean()
-
-    # Remove Nan Values on Rating
-    df2 = df2.dropna(subset=['rating'])
-    df2['rating'] = df2['rating'].astype(int)
-
-    logging.info("Data transformed successfully.")
-
-    return df1, df2
+    return project_name.strip().lower().replace(" ", "-")
 
 
 def load_music(project_name):
@@ -126,7 +62,7 @@ def load_music(project_name):
     Loads transformed data into a PostgreSQL database.
     """
 
-    PROJECT_ID = project_name.lower().replace(" ", "-")
+    PROJECT_ID = project_id(project_name)
 
     try:
         logging.info(f"Starting ETL process for project: {project_name}")
@@ -144,7 +80,51 @@ def load_music(project_name):
         return
 
     try:
-        logging.info(f"Loading {len(df1 + df2)} rows into application project")
+        logging.info(f"Loading {len(df1) + len(df2)} rows into application project")
         return df1, df2
     except Exception as e:
         logging.error(f"Failed to load data into application project. Error: {e}")
+
+
+def load_music_cached(project_name):
+    """
+    Returns load_music results from an in-process LRU cache keyed by project id.
+    Entries expire after the project's updateFrequency; failed loads are not cached.
+    """
+    key = project_id(project_name)
+    now = datetime.datetime.now()
+
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > now:
+            _cache.move_to_end(key)
+            _cache_stats['hits'] += 1
+            # Callers add columns to the frames, so hand out copies
+            return entry[1].copy(), entry[2].copy()
+        _cache_stats['misses'] += 1
+
+    result = load_music(project_name)
+    if result is None:
+        return
+
+    df1, df2 = result
+    ttl = CACHE_TTL.get(df1['updateFrequency'].iloc[0], DEFAULT_CACHE_TTL)
+
+    with _cache_lock:
+        _cache[key] = (now + ttl, df1, df2, frame_bytes(df1, df2))
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_PROJECTS:
+            _cache.popitem(last=False)
+            _cache_stats['evictions'] += 1
+
+    logging.info(f"Cached project {key} for {ttl}.")
+
+    return df1.copy(), df2.copy()
+
+
+def cache_stats():
+    """
+    Returns the cache hit/miss/eviction counters, the number of cached projects and the memory they hold in bytes.
+    """
+    with _cache_lock:
+        return dict(_cache_stats, projects=len(_cache), bytes=sum(entry[3] for entry in _cache.values()))
@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Lengths, in albums, of the rolling mean and standard deviation windows
+WINDOWS = (5, 10, 25)
+
+# Spans, in albums, of the exponentially weighted means
+EWM_SPANS = (5, 10, 25)
+
+# Albums frame columns the windowed statistics are computed over
+WINDOW_COLUMNS = ('rating', 'globalRating')
+
+# Albums in the global rating streak, a rolling mean over history positions rather than known values
+STREAK_WINDOW = 5
+
+
+def window_columns(columns=WINDOW_COLUMNS, windows=WINDOWS, spans=EWM_SPANS):
+    """
+    Returns the names of the statistics columns, such as 'ratingMean5', 'ratingStd5' and 'ratingEwm5'.
+    """
+    names = []
+    for column in columns:
+        names += [f'{column}Mean{window}' for window in windows]
+        names += [f'{column}Std{window}' for window in windows]
+        names += [f'{column}Ewm{span}' for span in spans]
+    return names
+
+
+def rolling_stats(values, windows=WINDOWS, spans=EWM_SPANS, tail=None, last_ewm=None):
+    """
+    Computes the rolling mean and sample standard deviation of every window, and the exponentially weighted
+    mean of every span, of a series of known values. Every window is a difference of the same two cumulative
+    sums, so all of them come from one pass over the values.
+    tail holds the values preceding these ones and last_ewm the weighted means reached at the last of them,
+    so appended values continue the statistics of an earlier call. Returns a dict of arrays.
+    """
+    tail = np.empty(0) if tail is None else np.asarray(tail, dtype=np.float64)
+    last_ewm = last_ewm or {}
+    values = np.asarray(values, dtype=np.float64)
+
+    padded = np.concatenate([tail, values])
+    sums = np.concatenate([[0], np.cumsum(padded)])
+    squares = np.concatenate([[0], np.cumsum(padded * padded)])
+
+    # Windows ending at each of the new values, as exclusive end offsets into the cumulative sums
+    ends = np.arange(len(tail) + 1, len(padded) + 1)
+
+    stats = {}
+    for window in windows:
+        starts = ends - window
+        full = starts >= 0
+        starts = np.maximum(starts, 0)
+        total = sums[ends] - sums[starts]
+        total_squares = squares[ends] - squares[starts]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (total_squares - total * total / window) / (window - 1)
+
+        stats[f'Mean{window}'] = np.where(full, total / window, np.nan)
+        stats[f'Std{window}'] = np.where(full & (window > 1), np.sqrt(np.maximum(variance, 0)), np.nan)
+
+    for span in spans:
+        # Without adjustment each weighted mean is a recursion on the previous one, so prepending it resumes the series
+        previous = last_ewm.get(span)
+        series = pd.Series(values if previous is None else np.r_[previous, values])
+        ewm = series.ewm(span=span, adjust=False).mean().to_numpy()
+        stats[f'Ewm{span}'] = ewm if previous is None else ewm[1:]
+
+    return stats
+
+
+def rolling_mean(values, window):
+    """
+    Computes the rolling mean over the last window positions, with the NaN semantics of pandas'
+    rolling(window).mean(): NaN unless every value of the window is known. Each window's sum and count of
+    known values are differences of cumulative sums, so a missing value blanks exactly the windows holding it.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    known = ~np.isnan(values)
+    sums = np.concatenate([[0], np.cumsum(np.where(known, values, 0))])
+    counts = np.concatenate([[0], np.cumsum(known)])
+
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    full = (ends >= window) & (counts[ends] - counts[starts] == window)
+
+    return np.where(full, (sums[ends] - sums[starts]) / window, np.nan)
+
+
+def last_known(values, count):
+    """
+    Returns the positions of the last count known values, scanning back from the end
+    only as far as needed so appending to a long history stays cheap.
+    """
+    size = count
+    while True:
+        recent = values[max(len(values) - size, 0):]
+        positions = len(values) - len(recent) + np.flatnonzero(~np.isnan(recent))
+        if len(positions) >= count or len(recent) == len(values):
+            return positions[max(len(positions) - count, 0):]
+        size *= 2
+
+
+def window_stats(df2, previous=None, columns=WINDOW_COLUMNS, windows=WINDOWS, spans=EWM_SPANS):
+    """
+    Computes the windowed statistics of every column over the albums frame, in history order.
+    Each column's statistics run over the albums where it is known, so unrated albums are skipped
+    by the rating windows; they get NaN statistics of their own.
+    With previous, the frame these albums are appended to along with its statistics, only the new albums
+    are computed, continuing where previous left off; previous must hold every album, unrated ones included,
+    so the ETL, which only stores rated albums, recomputes the whole history instead. Returns a frame of the
+    window_columns.
+    """
+    stats = {}
+    longest = max(windows, default=1)
+
+    for column in columns:
+        values = df2[column].to_numpy(dtype=np.float64)
+        known = ~np.isnan(values)
+
+        tail, last_ewm = None, None
+        if previous is not None:
+            previous_values = previous[column].to_numpy(dtype=np.float64)
+            rows = last_known(previous_values, max(longest - 1, 1))
+            tail = previous_values[rows] if longest > 1 else None
+            last_ewm = {span: previous[f'{column}Ewm{span}'].to_numpy()[rows[-1]] for span in spans if len(rows)}
+
+        for name, result in rolling_stats(values[known], windows, spans, tail, last_ewm).items():
+            stats[f'{column}{name}'] = np.full(len(values), np.nan)
+            stats[f'{column}{name}'][known] = result
+
+    return pd.DataFrame(stats, index=df2.index)[window_columns(columns, windows, spans)]